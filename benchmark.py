@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import statistics
+from itertools import product
+
+import numpy as np
+
+from game_of_life import GameOfLife
+
+
+colors = (None, 'color', 'color2', 'color3', 'color4')
+
+
+def make_world(size, seed=0, ratio=0.5):
+    rng = np.random.default_rng(seed)
+    return (rng.random((size, size)) < ratio).astype(np.uint8)
+
+
+def make_options(torus, mortal, color):
+    options = {'torus': torus, 'mortal': mortal}
+    if color is not None:
+        options[color] = True
+    return options
+
+
+def label(options):
+    names = [name for name, value in options.items() if value]
+    return ' '.join(names) or 'plain'
+
+
+def measure(func, warmup, repeat, setup=None):
+    # seconds of each repetition after the warm up, setup is not timed
+    times = []
+    for i in range(warmup + repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        elp = time.perf_counter() - start
+        if i >= warmup:
+            times.append(elp)
+    return times
+
+
+def summarize(amounts, times):
+    # statistics of the rates of the repetitions
+    rates = [amount / elp for amount, elp in zip(amounts, times)]
+    return {
+        'median': statistics.median(rates),
+        'mean': statistics.fmean(rates),
+        'stdev': statistics.stdev(rates) if len(rates) > 1 else 0.0,
+        'min': min(rates),
+        'max': max(rates),
+        'repeat': len(rates),
+    }
+
+
+def bench_engine(engine, size, options, steps, warmup, repeat):
+    # cells per second of the generations from the same state
+    game = GameOfLife(world=make_world(size), headless=True, engine=engine,
+                      **options)
+    state = game.backend.get_state()
+
+    def run():
+        for _ in range(steps):
+            game.backend.step()
+
+    times = measure(run, warmup, repeat,
+                    lambda: game.backend.set_state(state))
+    return summarize([size * size * steps] * repeat, times)
+
+
+def bench_render(size, options, steps, warmup, repeat):
+    # bytes per second of the frames written by the console, the
+    # generations are stepped before
+    with tempfile.TemporaryFile() as f:
+        fd = f.fileno()
+        game = GameOfLife(world=make_world(size), fd=fd, **options)
+        console = game.console
+        first = (np.copy(game.world), game.step, np.copy(game.colors))
+        frames = []
+        for _ in range(steps):
+            game.backend.step()
+            frames.append((np.copy(game.diff_world), game.step,
+                           np.copy(game.colors), np.copy(game.world)))
+
+        amounts = []
+
+        def setup():
+            os.ftruncate(fd, 0)
+            os.lseek(fd, 0, os.SEEK_SET)
+
+        def render():
+            console.display(*first)
+            for frame in frames:
+                console.update(*frame)
+            amounts.append(os.lseek(fd, 0, os.SEEK_CUR))
+
+        times = measure(render, warmup, repeat, setup)
+    return summarize(amounts[warmup:], times)
+
+
+def run(sizes=(64, 256, 1024), engines=('opencv', 'numpy'), steps=10,
+        warmup=1, repeat=5, render=True, log=None, cells=1 << 22):
+    results = []
+    for size, torus, mortal, color in product(sizes, (False, True),
+                                              (False, True), colors):
+        options = make_options(torus, mortal, color)
+        # small worlds are stepped more to be timed over the noise
+        steps_size = max(steps, cells // (size * size))
+        benches = [('engine', engine, 'cells/s', lambda engine=engine:
+                    bench_engine(engine, size, options, steps_size, warmup,
+                                 repeat)) for engine in engines]
+        if render:
+            benches.append(('render', None, 'bytes/s', lambda:
+                            bench_render(size, options, steps_size, warmup,
+                                         repeat)))
+        for kind, engine, unit, bench in benches:
+            try:
+                stats = bench()
+            except ValueError:
+                # engine is not for the options
+                continue
+            result = {'kind': kind, 'engine': engine, 'size': size,
+                      'options': options, 'steps': steps_size, 'unit': unit,
+                      **stats}
+            results.append(result)
+            if log is not None:
+                log(result)
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'warmup': warmup,
+        'results': results,
+    }
+
+
+def key(result):
+    return (f"{result['kind']} {result['engine'] or ''} "
+            f"{result['size']} {label(result['options'])}")
+
+
+def compare(report, base, threshold=0.1):
+    # medians relative to the base, regressions are slower than threshold
+    base_results = {key(result): result for result in base['results']}
+    regressions = []
+    for result in report['results']:
+        base_result = base_results.get(key(result))
+        if base_result is None:
+            continue
+        ratio = result['median'] / base_result['median']
+        result['ratio'] = ratio
+        if ratio < 1 - threshold:
+            regressions.append(result)
+    return regressions
+
+
+def print_result(result):
+    line = (f"{result['kind']:6} {result['engine'] or '-':8} "
+            f"{result['size']:>5} {label(result['options']):24} "
+            f"{result['median'] / 1e6:10.2f} M{result['unit']} "
+            f"±{result['stdev'] / result['median'] * 100:4.1f}%")
+    if 'ratio' in result:
+        line += f"  x{result['ratio']:.2f}"
+    print(line, flush=True)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+                description='benchmark of game_of_life engines and rendering')
+    parser.add_argument('-s', '--sizes', type=int, nargs='+',
+                        default=[64, 256, 1024])
+    parser.add_argument('-e', '--engines', nargs='+',
+                        default=['opencv', 'numpy'],
+                        choices=('opencv', 'numpy', 'bit', 'hashlife',
+                                 'sparse', 'parallel'))
+    parser.add_argument('-n', '--steps', type=int, default=10)
+    parser.add_argument('-w', '--warmup', type=int, default=1)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('-nr', '--no-render', action='store_true')
+    parser.add_argument('-o', '--output')
+    parser.add_argument('-c', '--compare')
+    parser.add_argument('-t', '--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.engines, args.steps, args.warmup,
+                 args.repeat, not args.no_render,
+                 None if args.compare else print_result)
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for result in report['results']:
+            print_result(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    if regressions:
+        print(f'{len(regressions)} regressions slower than '
+              f'{args.threshold:.0%}')
+        sys.exit(1)
@@ -1,13 +1,23 @@
 import time
-from platform import system
-from ctypes import windll
-from random import random, randrange
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from queue import Queue, Full, Empty
+import os
+import sys
+import io
 import json
+import re
 import pprint
+import gzip
+import struct
+import tempfile
 
 import numpy as np
-import cv2
+
+# imported by the engines using open-cv
+cv2 = None
 
 
 # for lineprofiler
@@ -19,17 +29,39 @@ except NameError:
         return func
 
 
+def _import_cv2():
+    global cv2
+    if cv2 is None:
+        import cv2 as module
+        cv2 = module
+    return cv2
+
+
 class GameOfLife:
+    # binary snapshot files, gzip compressed with '.gz'
+    snapshot_extensions = ('.gol', '.gol.gz')
+    snapshot_magic = b'GOL\x01'
+    # measured times of engines for the 'auto' engine
+    engine_cache = os.path.join('~', '.cache', 'game_of_life', 'engines.json')
+    # world and diff_world are not unpacked yet by the engine
+    _packed = False
+
     def __init__(self, sample=None, name='game_of_life', x=30, y=15,
                  world=None, max_step=None, wait=0.03, delay=0.0,
                  alive='■', ratio=0.5, loop=False, torus=False, mortal=False,
                  rand=False,
                  color=False, color2=False, color3=False, color4=False,
-                 json_file=None):
+                 json_file=None, headless=False, engine='opencv',
+                 workers=None, rule=None, neighborhood=None, fd=1,
+                 fps=None, pipeline=None, queue_size=4, cycle=None,
+                 history=64, seed=None, symmetry=None, gradient=False,
+                 state_file=None):
         self.sample = sample
         self.name = name
-        samples, colors = self._load_samples('samples.json'), None
-        if sample in samples:
+        samples, colors = {}, None
+        if sample is not None:
+            samples[sample] = self._load_sample('samples.json', sample)
+        if samples.get(sample) is not None:
             self.name = sample
             if 'world' in samples[sample]:
                 world = samples[sample]['world']
@@ -40,6 +72,12 @@ class GameOfLife:
                 colors = samples[sample]['colors']
             if 'wait' in samples[sample]:
                 wait = samples[sample]['wait']
+            if 'rule' in samples[sample]:
+                if rule is None:
+                    rule = samples[sample]['rule']
+            if 'neighborhood' in samples[sample]:
+                if neighborhood is None:
+                    neighborhood = samples[sample]['neighborhood']
 
         self.x, self.y = x, y
         random_cells = False
@@ -48,12 +86,26 @@ class GameOfLife:
             self.world = [[x for x in row] for row in world]
         else:
             random_cells = True
-            self.world = [
-                [random() < ratio for _ in range(x)] for _ in range(y)
-            ]
+            self.world = None
 
         self.max_step = max_step if max_step is not None else 100
         self.wait = wait
+        # target generations per second instead of the wait
+        self.fps = fps
+        self.dropped = 0
+        # render on a thread, 'block' or 'drop' the oldest when queue is full
+        if pipeline not in (None, 'block', 'drop'):
+            raise ValueError(f'unknown pipeline : {pipeline}')
+        self.pipeline = pipeline
+        self.queue_size = queue_size
+        # 'detect' cycles of the world, then 'stop' or 'skip' the periods
+        if cycle not in (None, 'detect', 'stop', 'skip'):
+            raise ValueError(f'unknown cycle : {cycle}')
+        self.cycle = cycle
+        self.history = history
+        self.period = None
+        self.transient = None
+        self._hashes = OrderedDict()
         self.delay = delay
         self.alive = alive
         self.ratio = ratio
@@ -65,28 +117,45 @@ class GameOfLife:
         self.color2 = color2
         self.color3 = color3
         self.color4 = color4
+        self.rule = Rule(rule if rule is not None else 'B3/S23')
+        self.neighborhood = neighborhood
+        # random world is made of the seed, 'C2', 'D2' or 'D4' symmetric,
+        # and with density from the ratio to 0 in x if gradient
+        if symmetry not in (None, 'C2', 'D2', 'D4'):
+            raise ValueError(f'unknown symmetry : {symmetry}')
+        self.seed = seed
+        self.symmetry = symmetry
+        self.gradient = gradient
 
+        self.step = 1
+        self.colors, self.ages = colors, None
         if json_file is not None:
             random_cells = False
             self._load(json_file)
-
-        self.step = 1
-        self.colors = [[0 for _ in row] for row in self.world]
-        if colors:
-            self.colors = colors
+        out_of_core = getattr(engine, 'name', engine) == 'memmap'
+        if out_of_core:
+            # the world lives in the state file, made if it is not there
+            random_cells = False
+            self._open_state(state_file)
+        if max_step is not None:
+            # the step given by the caller is over the one in the file
+            self.max_step = max_step
+        if self.world is None:
+            self.world = self.make_world()
 
         self.alives = [('　', 0), (self.alive, 10), ('□', 30), ('・', 60)]
         self.lifespans = [alive[1] for alive in self.alives]
         self.marks = [''] + [alive[0] for alive in self.alives]
 
+        # colors of the loaded file are over the arguments
         color_type = None
-        if color:
+        if self.color:
             color_type = 'vitamin'
-        elif color2:
+        elif self.color2:
             color_type = 'pastel'
-        elif color3:
+        elif self.color3:
             color_type = 'thermography'
-        elif color4:
+        elif self.color4:
             color_type = 'matrix'
             a = self.alive
             self.alives = [
@@ -101,134 +170,561 @@ class GameOfLife:
             ]
             self.lifespans = [alive[1] for alive in self.alives]
             self.marks = [''] + [alive[0] for alive in self.alives]
-        self.console = Console(self.x, self.y, self.name,
-                               self.marks, color_type, self.random)
+        if self.rule.states > 2:
+            if self.mortal:
+                raise ValueError('generations rule has its own aging, '
+                                 'mortal is not available')
+            self.age_lut = self.make_state_lut(self.rule.states,
+                                               len(self.alives) - 1)
+        else:
+            self.age_lut = self.make_age_lut(self.lifespans)
+        self.headless = headless
+        self.console = None
+        if not headless:
+            self.console = Console(self.x, self.y, self.name,
+                                   self.marks, color_type, self.random,
+                                   fd)
 
-        if random_cells:
+        if random_cells and not headless:
+            # batch runs make the same world again by the seed
             self._dump()
 
         # numpy & open-cv
-        self.world = np.array(self.world, dtype=np.uint8)
-        self.ages = np.copy(self.world)
-        self.colors = np.array(self.colors, dtype=np.uint8)
-        self.kernel = np.array(
-                [[1, 1, 1], [1, 0, 1], [1, 1, 1]], dtype=np.uint8)
+        if not out_of_core:
+            self.world = np.array(self.world, dtype=np.uint8)
+        self.kernel = self.make_kernel(self.neighborhood)
+        self.radius = self.kernel.shape[0] // 2
+        self.max_around = int(self.kernel.sum())
+        self.rule.table = self.rule.make_table(self.max_around)
+
+        # engine is the name, 'auto' to select by the benchmark, or a
+        # subclass of Engine
+        self.workers = workers
+        self.color_type = color_type
+        if engine == 'auto':
+            engine = self._select_engine()
+        backend = engine if isinstance(engine, type) else ENGINES.get(engine)
+        if backend is None:
+            raise ValueError(f'unknown engine : {engine}')
+        self.engine = backend.name
+        if not backend.colored:
+            # one zero cell viewed as the whole world, not allocated
+            self.colors = self.ages = np.broadcast_to(np.uint8(0),
+                                                      self.world.shape)
+        else:
+            if self.colors is None or not np.size(self.colors):
+                self.colors = np.zeros(self.world.shape, dtype=np.uint8)
+            if self.ages is None:
+                self.ages = np.copy(self.world)
+            self.ages = np.asarray(self.ages, dtype=np.uint8)
+            self.colors = np.asarray(self.colors, dtype=np.uint8)
+        self.backend = backend(self)
+
+    @property
+    def world(self):
+        # packed engines unpack the world only when it is read
+        if self._packed:
+            self.backend.unpack()
+        return self._world
+
+    @world.setter
+    def world(self, world):
+        self._world = world
+
+    @property
+    def diff_world(self):
+        if self._packed:
+            self.backend.unpack()
+        return self._diff_world
+
+    @diff_world.setter
+    def diff_world(self, diff_world):
+        self._diff_world = diff_world
 
     def start(self):
+        if self.console is None:
+            return self.run()
+        renderer = None
         try:
             self.console.setup()
             self.console.display(self.world, self.step, self.colors)
             time.sleep(self.delay)
+            if self.pipeline is not None:
+                renderer = Renderer(self.console, self.world, self.pipeline,
+                                    self.queue_size)
+            self._frame = self._rendered = time.perf_counter()
+            skipped = None
+            self._detect_cycle()
             while True:
                 if self.step == self.max_step:
                     if not self.loop:
                         # if loop option is enabled, game_of_life is never end.
                         break
-                self._update()
-                self._wait()
-                self.console.update(self.diff_world, self.step, self.colors)
+                if self.period is not None and self.cycle == 'stop':
+                    break
+                self.backend.step()
+                if self._detect_cycle() and self.cycle == 'skip' and \
+                        not self.loop:
+                    self._skip_cycles(self.max_step)
+                if not self._wait():
+                    # remember cells changed in the dropped generations
+                    if renderer is None:
+                        changed = self.diff_world != 0
+                        skipped = changed if skipped is None else \
+                            skipped | changed
+                    continue
+                if renderer is not None:
+                    # the renderer diffs the snapshot with the shown world
+                    renderer.push(self.world, self.step, self.colors,
+                                  self.dropped)
+                    self._rendered = time.perf_counter()
+                    continue
+                diff_world = self.diff_world
+                if skipped is not None:
+                    skipped |= diff_world != 0
+                    diff_world = (self.world + 1) * skipped
+                    skipped = None
+                self.console.dropped = self.dropped
+                self.console.update(diff_world, self.step, self.colors,
+                                    self.world)
+                self._rendered = time.perf_counter()
         except KeyboardInterrupt:
             return
         finally:
-            self.console.teardown()
+            try:
+                if renderer is not None:
+                    renderer.close()
+                    self.dropped += renderer.dropped
+            finally:
+                # the cursor is shown even if the renderer failed
+                self.console.teardown()
 
-    def _load_samples(self, samples_file):
-        samples = {}
+    def run(self, steps=None):
+        # advance the world without any rendering and waiting
+        if steps is None:
+            steps = max(self.max_step - self.step, 0)
+        start, start_step = time.perf_counter(), self.step
+        try:
+            if self.cycle is not None:
+                # check the world of every generation
+                end_step = self.step + steps
+                self._detect_cycle()
+                while self.step < end_step:
+                    if self.period is not None and self.cycle == 'stop':
+                        break
+                    self.backend.step()
+                    if self._detect_cycle() and self.cycle == 'skip':
+                        self._skip_cycles(end_step)
+            else:
+                self.step_n(steps)
+        finally:
+            if self.engine == 'memmap':
+                # the state file is stopped at the generation, dirty if
+                # a step was stopped halfway
+                self._sync_state(self.state_dirty)
+        elp = time.perf_counter() - start
+        steps = self.step - start_step
+        # copies, since engines step into the same buffers, but the world
+        # mapped to the state file and the shared zero views
+        world = self.world if self.engine == 'memmap' else np.copy(self.world)
+        copy = np.copy if self.backend.colored else np.asarray
+        return {
+            'world': world,
+            'colors': copy(self.colors),
+            'ages': copy(self.ages),
+            'step': self.step,
+            'gps': steps / elp if elp > 0 else float('inf'),
+            'period': self.period,
+            'transient': self.transient,
+        }
+
+    def _detect_cycle(self):
+        # return True when the world repeats one in the history window
+        if self.cycle is None or self.period is not None:
+            return False
+        if self.mortal or self.rule.states > 2:
+            state = np.asarray(self.ages, dtype=np.uint8).tobytes()
+        else:
+            state = np.packbits(self.world).tobytes()
+        if self.color_type is not None:
+            # born cells get new colors, which repeat later than the cells
+            state += np.asarray(self.colors, dtype=np.uint8).tobytes()
+        key = hash(state)
+        pre_step = self._hashes.get(key)
+        if pre_step is None or pre_step == self.step:
+            self._hashes[key] = self.step
+            if len(self._hashes) > self.history:
+                self._hashes.popitem(last=False)
+            return False
+        self.period = self.step - pre_step
+        # generations before the cycle, the first step is 1
+        self.transient = pre_step - 1
+        return True
+
+    def _skip_cycles(self, end_step):
+        # the world is the same after the whole periods
+        self.step += (end_step - self.step) // self.period * self.period
+
+    def _select_engine(self, steps=4, repeat=3):
+        # fastest engine for the size, density and options, measured once
+        # on a random world of the buckets and cached on the disk
+        size = min(max(round(np.log2(self.x * self.y) / 2), 4), 9)
+        density = np.count_nonzero(self.world) / max(self.world.size, 1)
+        ratio = min((0.001, 0.01, 0.1, 0.5),
+                    key=lambda r: abs(np.log(max(density, 0.001) / r)))
+        setting = {'rule': str(self.rule), 'neighborhood': self.neighborhood,
+                   'torus': self.torus, 'mortal': self.mortal,
+                   'color': self.color, 'color2': self.color2,
+                   'color3': self.color3, 'color4': self.color4}
+        key = json.dumps([1 << size, ratio, self.headless, setting],
+                         sort_keys=True)
+        cache_file = os.path.expanduser(self.engine_cache)
+        try:
+            with open(cache_file) as f:
+                cache = json.load(f)
+        except (FileNotFoundError, ValueError):
+            cache = {}
+        selected = cache.get(key, {}).get('engine')
+        if not getattr(ENGINES.get(selected), 'auto', False):
+            world = np.random.default_rng(0).random((1 << size, 1 << size))
+            setting.update({'world': (world < ratio).astype(np.uint8),
+                            'headless': True})
+            times = {}
+            for name, backend in ENGINES.items():
+                if not backend.auto:
+                    continue
+                try:
+                    game = GameOfLife(engine=name, **setting)
+                except (ValueError, ImportError):
+                    continue
+                # every repeat starts from the same state, run jumps by
+                # step_n, start renders every step
+                state = game.backend.get_state()
+                best = float('inf')
+                for _ in range(repeat):
+                    game.backend.set_state(state)
+                    start = time.perf_counter()
+                    if self.headless:
+                        game.backend.step_n(steps)
+                    else:
+                        for _ in range(steps):
+                            game.backend.step()
+                    best = min(best, time.perf_counter() - start)
+                game.backend.close()
+                times[name] = best / steps
+            cache[key] = {'engine': min(times, key=times.get), 'times': times}
+            # written aside and replaced, since processes run at once
+            cache_dir = os.path.dirname(cache_file)
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile('w', dir=cache_dir,
+                                             suffix='.tmp',
+                                             delete=False) as f:
+                json.dump(cache, f, indent=1)
+            try:
+                os.replace(f.name, cache_file)
+            except OSError:
+                os.remove(f.name)
+                raise
+        return cache[key]['engine']
+
+    def make_age_lut(self, lifespans):
+        # next state of alive cells by age, 0 if expiring lifespan
+        lut = np.ones(256, dtype=np.uint8)
+        for age in range(256):
+            for index, lifespan in enumerate(lifespans):
+                if age < lifespan:
+                    lut[age] = index
+                    break
+        lut[max(lifespans[-1] - 1, 0):] = 0
+        return lut
+
+    def make_state_lut(self, states, levels):
+        # marks of generations states, dying states share the later marks
+        lut = np.zeros(256, dtype=np.uint8)
+        lut[1] = 1
+        for state in range(2, states):
+            lut[state] = 2 + (state - 2) * (levels - 1) // (states - 2)
+        return np.minimum(lut, levels)
+
+    def _load_sample(self, samples_file, sample):
+        # decode only the object of the sample, not the whole samples
         try:
             with open(samples_file, 'r') as f:
-                samples = json.load(f)
+                text = f.read()
         except FileNotFoundError:
-            pass
-        return samples
+            return None
+        # values of the samples have no objects, so the key followed by
+        # an object is the sample
+        key = re.compile(re.escape(json.dumps(sample)) + r'\s*:\s*\{')
+        match = key.search(text)
+        if match is None:
+            return None
+        return json.JSONDecoder().raw_decode(text, match.end() - 1)[0]
 
     def _load(self, json_file):
+        if json_file.endswith(self.snapshot_extensions):
+            self._load_snapshot(json_file)
+            return
         try:
             with open(json_file, 'r') as f:
                 settings = json.load(f)
-                self.name = settings['name']
-                self.x = settings['x']
-                self.y = settings['y']
-                self.world = settings['world']
-                self.max_step = settings['step']
-                self.wait = settings['wait']
-                self.delay = settings['delay']
-                self.alive = settings['alive']
-                self.ratio = settings['ratio']
-                self.loop = settings['loop']
-                self.torus = settings['torus']
-                self.mortal = settings['mortal']
-                self.random = settings['random']
-                self.color = settings['color']
-                self.color2 = settings['color2']
-                self.color3 = settings['color3']
-                self.color4 = settings['color4']
+                self._load_settings(settings)
         except FileNotFoundError:
             pass
 
+    def _load_settings(self, settings):
+        self.name = settings['name']
+        self.x = settings['x']
+        self.y = settings['y']
+        self.world = settings.get('world')
+        self.max_step = settings['step']
+        self.wait = settings['wait']
+        self.delay = settings['delay']
+        self.alive = settings['alive']
+        self.ratio = settings['ratio']
+        self.loop = settings['loop']
+        self.torus = settings['torus']
+        self.mortal = settings['mortal']
+        self.random = settings['random']
+        self.color = settings['color']
+        self.color2 = settings['color2']
+        self.color3 = settings['color3']
+        self.color4 = settings['color4']
+        self.rule = Rule(settings.get('rule', 'B3/S23'))
+        self.neighborhood = settings.get('neighborhood')
+        self.seed = settings.get('seed')
+        self.symmetry = settings.get('symmetry')
+        self.gradient = settings.get('gradient', False)
+
+    def make_world(self, band=1024, out=None):
+        # random cells of the seed, generated by bands of rows
+        if self.seed is None:
+            self.seed = int(np.random.SeedSequence().generate_state(1)[0])
+        rng = np.random.default_rng(self.seed)
+        x, y = self.x, self.y
+        ratio = np.float32(self.ratio)
+        if self.gradient:
+            ratio = ratio * (x - np.arange(x, dtype=np.float32)) / x
+        world = np.empty((y, x), dtype=np.uint8) if out is None else out
+        for y0 in range(0, y, band):
+            y1 = min(y0 + band, y)
+            world[y0:y1] = rng.random((y1 - y0, x), dtype=np.float32) < ratio
+
+        if self.symmetry == 'C2':
+            # rotation by 180 degrees reverses the cells
+            cells = world.ravel()
+            cells[(cells.size + 1) // 2:] = cells[:cells.size // 2][::-1]
+        if self.symmetry in ('D2', 'D4'):
+            world[:, (x + 1) // 2:] = world[:, :x // 2][:, ::-1]
+        if self.symmetry == 'D4':
+            world[(y + 1) // 2:] = world[:y // 2][::-1]
+        return world
+
     def _update(self):
-        # get previous
-        pre_world = np.copy(self.world)
-        ones = np.ones_like(pre_world, dtype=np.uint8)
-        pre_cells = (pre_world >= 1) * ones
-        pre_colors = np.copy(self.colors)
+        self.backend.step()
 
-        if self.torus:
-            # wrap around
-            pre_cells = np.pad(pre_cells, 1, 'wrap')
-            pre_colors = np.pad(pre_colors, 1, 'wrap')
+    def step_n(self, n):
+        # advance n generations, diff_world is of the last one only
+        self.backend.step_n(n)
 
-        # get alive and born
-        kernel = self.kernel
-        border_type = cv2.BORDER_ISOLATED
-        around_cells = cv2.filter2D(pre_cells, -1,
-                                    kernel, borderType=border_type)
-        max_colors = cv2.dilate(pre_colors, kernel, borderType=border_type)
+    def make_kernel(self, neighborhood):
+        # weights of around cells, 'moore', 'neumann' or 'circular' with
+        # radius like 'moore5', or a list of weights, the radius is 1 or
+        # more since the halo of the world is cut by it
+        if neighborhood is None:
+            neighborhood = self.rule.neighborhood or 'moore'
+        if not isinstance(neighborhood, str):
+            kernel = np.array(neighborhood, dtype=np.uint8)
+            size = kernel.shape[0]
+            if kernel.ndim != 2 or size % 2 == 0 or \
+                    kernel.shape[1] != size:
+                raise ValueError('kernel must be odd sized square')
+            if size < 3:
+                raise ValueError('kernel must be 3 or more in size')
+            return kernel
 
-        if self.torus:
-            # remove around
-            pre_cells = pre_cells[1:-1, 1:-1]
-            pre_colors = pre_colors[1:-1, 1:-1]
-            around_cells = around_cells[1:-1, 1:-1]
-            max_colors = max_colors[1:-1, 1:-1]
+        name = neighborhood.lower().rstrip('0123456789')
+        radius = int(neighborhood[len(name):] or 1)
+        if radius < 1:
+            raise ValueError(f'invalid neighborhood : {neighborhood}')
+        y, x = np.ogrid[-radius:radius + 1, -radius:radius + 1]
+        if name == 'moore':
+            kernel = np.ones((radius * 2 + 1, radius * 2 + 1), dtype=np.uint8)
+        elif name == 'neumann':
+            kernel = (abs(y) + abs(x) <= radius).astype(np.uint8)
+        elif name == 'circular':
+            kernel = (y * y + x * x <= radius * radius + radius)
+            kernel = kernel.astype(np.uint8)
+        else:
+            raise ValueError(f'unknown neighborhood : {neighborhood}')
+        kernel[radius, radius] = self.rule.middle
+        return kernel
 
-        alive = (pre_cells == 1) * ((around_cells == 2) | (around_cells == 3))
-        born = (pre_cells == 0) * (around_cells == 3)
+    def _wait(self):
+        # return False to drop rendering of the generation
+        if self.fps is None:
+            time.sleep(self.wait)
+            return True
+        period = 1 / self.fps
+        self._frame += period
+        now = time.perf_counter()
+        last = self.step == self.max_step and not self.loop
+        if now > self._frame and now - self._rendered < period and not last:
+            # behind the schedule, simulate without rendering to catch up
+            self.dropped += 1
+            return False
+        # forget the delay longer than a second
+        self._frame = max(self._frame, now - 1)
+        if self._frame > now:
+            time.sleep(self._frame - now)
+        return True
 
-        # update next cells
-        next_cells = alive | born
-        self.world = next_cells * ones
-        self.colors = alive * pre_colors + born * (max_colors + ones)
-
-        if self.mortal:
-            # aging
-            max_index = len(self.lifespans) - 1
-            for index, lifespan in enumerate(reversed(self.lifespans)):
-                aging_cells = np.where(alive & (self.ages < lifespan))
-                self.world[aging_cells] = max_index - index
-            self.ages[np.where(next_cells)] += 1
-
-            # check if expiring lifespan
-            max_lifespan = self.lifespans[-1]
-            self.world[np.where(self.ages >= max_lifespan)] = 0
-            self.ages[np.where(self.world == 0)] = 0
+    def save(self, file):
+        # binary snapshot by the extension, or json with the world
+        if file.endswith(self.snapshot_extensions):
+            self._save_snapshot(file)
+            return
+        settings = self._settings()
+        settings['world'] = np.asarray(self.world).tolist()
+        self._write_json(file, settings)
 
-        # erase same cells
-        self.diff_world = self.world + ones
-        self.diff_world[np.where(self.world == pre_world)] = 0
+    def _save_snapshot(self, file, band=1024):
+        # header of the settings, then cells written by bands of rows,
+        # bit-packed world and colors and ages only if they are used
+        world = self.world
+        packed = bool(world.max(initial=0) <= 1)
+        arrays = ['world']
+        if self.color or self.color2 or self.color3 or self.color4:
+            arrays.append('colors')
+        if self.mortal or self.rule.states > 2:
+            arrays.append('ages')
+        with self._open_snapshot(file, 'wb') as f:
+            self._write_header(f, packed, arrays)
+            for name in arrays:
+                array = getattr(self, name)
+                for y0 in range(0, self.y, band):
+                    rows = array[y0:y0 + band]
+                    if name == 'world' and packed:
+                        rows = np.packbits(rows, axis=1)
+                    f.write(np.ascontiguousarray(rows))
+
+    def _load_snapshot(self, file, band=1024):
+        try:
+            f = self._open_snapshot(file, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            settings = self._read_header(f, file)
+            shape = (self.y, self.x)
+            self.colors = None
+            for name in settings['arrays']:
+                array = np.empty(shape, dtype=np.uint8)
+                for y0 in range(0, self.y, band):
+                    rows = array[y0:y0 + band]
+                    if name == 'world' and settings['packed']:
+                        packed = np.empty((len(rows), (self.x + 7) // 8),
+                                          dtype=np.uint8)
+                        self._read_into(f, packed)
+                        rows[:] = np.unpackbits(packed, axis=1,
+                                                count=self.x)
+                    else:
+                        self._read_into(f, rows)
+                setattr(self, name, array)
 
-        self.step += 1
+    def _write_header(self, f, packed, arrays, align=1, dirty=False):
+        # padded with spaces to align the cells, returns the size
+        settings = self._settings()
+        settings.update({'generation': self.step, 'packed': packed,
+                         'arrays': arrays})
+        if dirty:
+            settings['dirty'] = True
+        header = json.dumps(settings).encode()
+        size = len(self.snapshot_magic) + 4 + len(header)
+        header += b' ' * (-size % align)
+        f.write(self.snapshot_magic)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        return size + -size % align
 
-    def _wait(self):
-        time.sleep(self.wait)
+    def _read_header(self, f, file):
+        if f.read(4) != self.snapshot_magic:
+            raise ValueError(f'not a snapshot : {file}')
+        data = f.read(4)
+        if len(data) < 4:
+            raise ValueError(f'snapshot is truncated : {file}')
+        size, = struct.unpack('<I', data)
+        data = f.read(size)
+        if len(data) < size:
+            raise ValueError(f'snapshot is truncated : {file}')
+        settings = json.loads(data)
+        self._load_settings(settings)
+        self.step = settings['generation']
+        return settings
+
+    def _open_state(self, state_file, align=4096):
+        # unpacked snapshot of the world only, mapped to the memory
+        if state_file is None:
+            raise ValueError('memmap engine needs state file')
+        self.state_file = state_file
+        world, created = self.world, not os.path.exists(state_file)
+        if created:
+            with open(state_file, 'wb') as f:
+                self.state_offset = self._write_header(f, False, ['world'],
+                                                       align)
+                f.truncate(self.state_offset + self.y * self.x)
+        else:
+            with open(state_file, 'rb') as f:
+                settings = self._read_header(f, state_file)
+                self.state_offset = f.tell()
+            if settings['packed'] or settings['arrays'] != ['world']:
+                raise ValueError(f'not a state file : {state_file}')
+            if settings.get('dirty'):
+                raise ValueError('state file is torn by a step stopped '
+                                 f'halfway : {state_file}')
+        self.state_dirty = False
+        self.world = np.memmap(state_file, dtype=np.uint8, mode='r+',
+                               offset=self.state_offset,
+                               shape=(self.y, self.x))
+        if created:
+            if world is None:
+                self.make_world(out=self.world)
+            else:
+                self.world[:] = world
+            self._sync_state()
+
+    def _sync_state(self, dirty=False):
+        # flush the cells, then the header of the current generation,
+        # which is dirty while a step changes the cells in place
+        if not dirty:
+            self.world.flush()
+        with open(self.state_file, 'r+b') as f:
+            if self._write_header(f, False, ['world'], self.state_offset,
+                                  dirty) > self.state_offset:
+                raise ValueError('header is over the cells of state file')
+        self.state_dirty = dirty
+
+    def _read_into(self, f, array):
+        if f.readinto(array) != array.nbytes:
+            raise ValueError('snapshot is truncated')
+
+    def _open_snapshot(self, file, mode):
+        if file.endswith('.gz'):
+            return gzip.open(file, mode, compresslevel=1)
+        return open(file, mode)
 
     def _dump(self):
         now = datetime.now().strftime('%Y%m%d%H%M%S')
         json_file = 'world' + now + '.json'
-        settings = {
-            'name': self.console.name,
+        self._write_json(json_file, self._settings())
+
+    def _settings(self):
+        return {
+            'name': self.name,
             'x': self.x,
             'y': self.y,
-            'world': self.world,
+            'seed': self.seed,
+            'symmetry': self.symmetry,
+            'gradient': self.gradient,
             'step': self.max_step,
             'wait': self.wait,
             'delay': self.delay,
@@ -242,24 +738,147 @@ class GameOfLife:
             'color2': self.color2,
             'color3': self.color3,
             'color4': self.color4,
+            'rule': str(self.rule),
+            'neighborhood': self.neighborhood,
         }
+
+    def _write_json(self, json_file, settings):
         with open(json_file, 'w') as f:
             output = pprint.pformat(settings, indent=4,
                                     width=1000, sort_dicts=False)
             output = output.replace("'", '"')
             output = output.replace('True', 'true')
             output = output.replace('False', 'false')
+            output = output.replace('None', 'null')
             f.write(output)
 
 
+class SoupSearch:
+    # step a stack of random worlds at once and collect stats of each
+    def __init__(self, worlds=None, n=100, x=30, y=15, ratio=0.5,
+                 torus=False, rule=None, neighborhood=None, history=64,
+                 seed=None):
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        if worlds is None:
+            worlds = rng.random((n, y, x), dtype=np.float32) < ratio
+        self.worlds = np.array(worlds, dtype=np.uint8)
+        self.n, self.y, self.x = self.worlds.shape
+        # same neighborhood and rule as a single world
+        game = GameOfLife(world=self.worlds[0], torus=torus, rule=rule,
+                          neighborhood=neighborhood, headless=True)
+        self.torus = torus
+        self.rule = game.rule
+        self.kernel = game.kernel
+        self.radius = game.radius
+        self.depth = -1 if game.max_around < 256 else cv2.CV_16U
+        self.history = history
+        # odd weights of the 64 bit hash of each world
+        size = self.y * self.x if self.rule.states > 2 else \
+            self.y * ((self.x + 7) // 8)
+        self._weights = rng.integers(
+            0, 1 << 63, size, dtype=np.uint64) * 2 + 1
+
+    def run(self, max_step=1000):
+        # step until each world finds a cycle or reaches max_step
+        n, history = self.n, self.history
+        populations = np.zeros((max_step + 1, n), dtype=np.int64)
+        populations[0] = self._population(self.worlds)
+        steps = np.full(n, max_step)
+        periods = np.zeros(n, dtype=np.int64)
+        hashes = np.zeros((n, history), dtype=np.uint64)
+        hash_steps = np.full(history, -1)
+        hashes[:, 0], hash_steps[0] = self._hash(self.worlds), 0
+
+        active = np.arange(n)
+        for step in range(1, max_step + 1):
+            worlds = self._step(self.worlds[active])
+            self.worlds[active] = worlds
+            populations[step, active] = self._population(worlds)
+
+            # the latest same world in the history window
+            keys = self._hash(worlds)
+            same = hashes[active] == keys[:, np.newaxis]
+            pre_steps = np.where(same, hash_steps, -1).max(axis=1)
+            hashes[active, step % history] = keys
+            hash_steps[step % history] = step
+            found = pre_steps >= 0
+            steps[active[found]] = step
+            periods[active[found]] = step - pre_steps[found]
+            active = active[~found]
+            if not active.size:
+                break
+
+        results = []
+        for i in range(n):
+            period = int(periods[i]) or None
+            results.append({
+                'population': populations[:steps[i] + 1, i].tolist(),
+                'census': self.census(self.worlds[i]),
+                'step': int(steps[i]),
+                'period': period,
+                'transient': int(steps[i]) - period if period else None,
+            })
+        return results
+
+    def census(self, world):
+        # count of objects by the canonical pattern like 'oo$oo'
+        cells = (world == 1).astype(np.uint8)
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(
+            cells, connectivity=8)
+        census = {}
+        for label in range(1, count):
+            x, y, w, h = stats[label, :4]
+            obj = labels[y:y + h, x:x + w] == label
+            key = min(self._pattern(np.rot90(o, k))
+                      for o in (obj, obj.T) for k in range(4))
+            census[key] = census.get(key, 0) + 1
+        return census
+
+    def _pattern(self, obj):
+        return '$'.join(''.join(row) for row in np.where(obj, 'o', '.'))
+
+    def _step(self, states):
+        # stack the worlds with halos and count around cells at once
+        m, r = len(states), self.radius
+        cells = states == 1 if self.rule.states > 2 else states
+        mode = 'wrap' if self.torus else 'constant'
+        padded = np.pad(cells.astype(np.uint8), ((0, 0), (r, r), (r, r)),
+                        mode=mode)
+        around_cells = cv2.filter2D(
+            padded.reshape(m * (self.y + r * 2), self.x + r * 2), self.depth,
+            self.kernel, borderType=cv2.BORDER_ISOLATED)
+        around_cells = around_cells.reshape(padded.shape)[:, r:-r, r:-r]
+        return self.rule.table[states, around_cells]
+
+    def _population(self, worlds):
+        return np.count_nonzero((worlds == 1).reshape(len(worlds), -1),
+                                axis=1)
+
+    def _hash(self, worlds):
+        # wrapping sum of the weighted bytes of each world
+        if self.rule.states > 2:
+            data = worlds.reshape(len(worlds), -1)
+        else:
+            data = np.packbits(worlds, axis=-1).reshape(len(worlds), -1)
+        return (data * self._weights).sum(axis=1, dtype=np.uint64)
+
+
 class Console:
-    def __init__(self, x, y, name, marks, color_type, random):
+    def __init__(self, x, y, name, marks, color_type, random, fd=1):
         self.x = x
         self.y = y
         self.name = name
         self.marks = marks
         self.random = random
-        if 'win' in system().lower():
+        self.dropped = 0
+        # each frame is built in the buffer and written to fd at once
+        self.fd = fd
+        self.buffer = io.StringIO()
+        self.encoding = sys.stdout.encoding or 'utf-8'
+        if sys.platform == 'win32':
             self._enable_win_escape_code()
         if color_type == 'vitamin':
             self.color_list = [
@@ -321,44 +940,65 @@ class Console:
             ]
         self.title = self._setup_title()
 
-        self._get_world = self._get_world_mono
+        # glyph of each cell, looked up by the cell + 1 like marks
+        self.glyphs = np.array(marks, dtype=object)
+        self._write_world = self._write_world_mono
         self.update = self._update_mono
         if color_type is not None:
-            self._get_world = self._get_world_color
+            self._write_world = self._write_world_color
             self.update = self._update_color
-            self.max_col = 18 if self.x * self.y > 3000 else 50
-            if y < self.max_col:
-                self.max_col = y
-        else:
-            self.max_col = 80
-        self.print_cnt = (y + self.max_col - 1) // self.max_col
+            # glyphs led by the color code, the row is the color + 1
+            # and row 0 is for the cells keeping the previous color
+            codes = np.array([''] + self.color_list, dtype=object)
+            self.color_glyphs = codes[:, np.newaxis] + self.glyphs
+        # cursor moves of the diff, line moves are indexed by lines + y + 2
+        self.forwards = np.array(
+            [self._cursor_forward(n) for n in range(x * 2 + 3)], dtype=object)
+        self.line_moves = np.array(
+            [self._cursor_previous_line(-n) if n < 0 else
+             self._cursor_next_line(n) for n in range(-y - 2, y + 2)],
+            dtype=object)
+        # redraw all when more cells than this ratio are changed
+        self.redraw_ratio = 0.6
 
     def setup(self):
+        # pending prints must come before the frames
+        sys.stdout.flush()
         self._clear_screen()
         self._cursor_hyde()
+        self._flush()
 
     def teardown(self):
         self._cursor_show()
+        self._flush()
 
     def display(self, world, step, colors):
-        screens = self._get_world(world, colors)
-        screens[0] = self._get_title() + screens[0]
-        screens[-1] = screens[-1] + self._get_step(step)
-        for screen in screens:
-            print(screen, end='')
+        self.buffer.write(self._get_title())
+        self._write_world(world, colors)
+        self.buffer.write(self._get_step(step))
+        self._flush()
+
+    def _flush(self):
+        # one write per frame, repeated only when the write is partial
+        data = memoryview(self.buffer.getvalue().encode(self.encoding))
+        while data:
+            data = data[os.write(self.fd, data):]
+        self.buffer.seek(0)
+        self.buffer.truncate()
 
     def _enable_win_escape_code(self):
+        from ctypes import windll
         kernel = windll.kernel32
         kernel.SetConsoleMode(kernel.GetStdHandle(-11), 7)
 
     def _clear_screen(self):
-        print("\033[;H\033[2J")
+        self.buffer.write('\033[;H\033[2J\n')
 
     def _cursor_hyde(self):
-        print('\033[?25l', end='')
+        self.buffer.write('\033[?25l')
 
     def _cursor_show(self):
-        print('\033[?25h', end='')
+        self.buffer.write('\033[?25h')
 
     def _cursor_forward(self, n):
         return f'\033[{n}C'
@@ -381,154 +1021,1256 @@ class Console:
     def _get_title(self):
         return f"{self.title}\n"
 
-    def _get_world_mono(self, world, _):
-        marks = self.marks
-        max_y, max_x = self.y, self.x
-        line = []
-        # setup screen for display world on cli
-        screens = ['┌' + ('─' * (max_x * 2 + 1)) + '┐\n']
-        for y in range(max_y):
-            cells = ''
-            for x in range(max_x):
-                cells += marks[world[y][x] + 1]
-            line += ['│ ' + cells + '│']
-        for i in range(self.print_cnt):
-            start = i * self.max_col
-            end = (i + 1) * self.max_col
-            screens += ['\n'.join(line[start:end]) + '\n']
-        screens += ['└' + ('─' * (max_x * 2 + 1)) + '┘\n']
-        return screens
-
-    def _get_world_color(self, world, colors):
-        color_list = self.color_list
-        marks = self.marks
-        max_y, max_x = self.y, self.x
-        max_color = len(color_list)
-        line = []
+    def _write_world_mono(self, world, _):
+        world = np.asarray(world)[:self.y]
+        lines = np.empty((self.y, self.x + 2), dtype=object)
+        lines[:, 0], lines[:, -1] = '│ ', '│\n'
+        lines[:, 1:-1] = self.glyphs[world + 1]
+        self._write_screen(lines)
+
+    def _write_world_color(self, world, colors):
+        world = np.asarray(world)[:self.y]
+        colors = np.asarray(colors)[:self.y] % len(self.color_list)
+        alive = world != 0
+
+        # color of the last alive cell up to each cell in the row
+        last = np.where(alive, np.arange(self.x), -1)
+        np.maximum.accumulate(last, axis=1, out=last)
+        rows = np.arange(self.y)[:, np.newaxis]
+        run_colors = np.where(last >= 0, colors[rows, last], 0)
+        pre_colors = np.zeros_like(run_colors)
+        pre_colors[:, 1:] = run_colors[:, :-1]
+
+        # change color only if it is different from previous
+        codes = np.where(alive & (colors != pre_colors), colors + 1, 0)
+        lines = np.empty((self.y, self.x + 2), dtype=object)
+        lines[:, 0], lines[:, -1] = '│ ', '│\n'
+        lines[:, 1:-1] = self.color_glyphs[codes, world + 1]
+        lines[run_colors[:, -1] != 0, -1] = self.color_list[0] + '│\n'
+        self._write_screen(lines)
+
+    def _write_screen(self, lines):
+        border = '─' * (self.x * 2 + 1)
         # setup screen for display world on cli
-        screens = ['┌' + ('─' * (max_x * 2 + 1)) + '┐\n']
-        for y in range(max_y):
-            cells, pre_color = '', 0
-            world_y = world[y]
-            colors_y = colors[y]
-            cells = ['　'] * max_x
-            for x, cell in enumerate(world_y):
-                if cell:
-                    mark = marks[cell + 1]
-                    # change color if it is different from previous
-                    if color := colors_y[x] % max_color:
-                        if color == pre_color:
-                            cells[x] = mark
-                        else:
-                            cells[x] = color_list[color] + mark
-                    else:
-                        if pre_color:
-                            cells[x] = color_list[0] + mark
-                        else:
-                            cells[x] = mark
-                    pre_color = color
-            if pre_color:
-                line += ['│ ' + ''.join(cells) + color_list[0] + '│']
-            else:
-                line += ['│ ' + ''.join(cells) + '│']
-        for i in range(self.print_cnt):
-            start = i * self.max_col
-            end = (i + 1) * self.max_col
-            screens += ['\n'.join(line[start:end]) + '\n']
-        screens += ['└' + ('─' * (max_x * 2 + 1)) + '┘\n']
-        return screens
-
-    def _update_mono(self, diff_world, step, _):
-        marks, max_y = self.marks, self.y
-        line, screens = [], []
-        for y in range(max_y):
-            cells = self._cursor_next_line(1)
-            last_x = -2
-            diff_world_y = diff_world[y]
-            for x, cell in enumerate(diff_world_y):
-                if cell:
-                    forward = (x - last_x - 1) * 2
-                    if forward:
-                        cells += self._cursor_forward(forward)
-                    mark = marks[cell]
-                    if self.random:
-                        if cell > 1:
-                            mark = marks[randrange(1, len(marks))]
-                    cells += mark
-                    last_x = x
-            if cells:
-                line += [cells]
-
-        for i in range(self.print_cnt):
-            start = i * self.max_col
-            end = (i + 1) * self.max_col
-            screens += [''.join(line[start:end])]
-
-        screens[0] = self._cursor_previous_line(max_y + 3) + screens[0]
-        screens[-1] += self._cursor_next_line(2)
-        screens[-1] += self._get_step(step)
-
-        for screen in screens:
-            print(screen, end='')
+        write = self.buffer.write
+        write('┌' + border + '┐\n')
+        write(''.join(lines.ravel().tolist()))
+        write('└' + border + '┘\n')
+
+    def _update_mono(self, diff_world, step, colors, world):
+        self._write_diff(diff_world, colors, world, None)
+        self.buffer.write(self._get_step(step))
+        self._flush()
 
     @profile
-    def _update_color(self, diff_world, step, colors):
-        marks = self.marks
-        color_list = self.color_list
-        max_color = len(color_list)
-        max_y = self.y
-        line, screens = [], []
-        for y in range(max_y):
-            cells = self._cursor_next_line(1)
-            last_x = -2
-            diff_world_y = diff_world[y]
-            colors_y = colors[y]
-            for x, cell in enumerate(diff_world_y):
-                if cell:
-                    forward = (x - last_x - 1) * 2
-                    if forward:
-                        cells += self._cursor_forward(forward)
-                    mark = marks[cell]
-                    if self.random:
-                        if cell > 1:
-                            mark = marks[randrange(1, len(marks))]
-                    cells += color_list[colors_y[x] % max_color] + mark
-                    last_x = x
-            line += [cells + color_list[0]]
-
-        for i in range(self.print_cnt):
-            start = i * self.max_col
-            end = (i + 1) * self.max_col
-            screens += [''.join(line[start:end])]
-
-        screens[0] = self._cursor_previous_line(max_y + 3) + screens[0]
-        screens[-1] += self._cursor_next_line(2)
-        screens[-1] += self._get_step(step)
-
-        for screen in screens:
-            print(screen, end='')
+    def _update_color(self, diff_world, step, colors, world):
+        self._write_diff(diff_world, colors, world, self.color_list)
+        self.buffer.write(self._get_step(step))
+        self._flush()
+
+    def _write_diff(self, diff_world, colors, world, color_list):
+        # write changed runs and leave the cursor on the step line
+        max_y, max_x = self.y, self.x
+        diff = np.asarray(diff_world)[:max_y].ravel()
+        changed = np.flatnonzero(diff)
+        if changed.size > diff.size * self.redraw_ratio:
+            self.buffer.write(self._cursor_previous_line(max_y + 3))
+            self._write_world(world, colors)
+            return
+        if not changed.size:
+            self.buffer.write(self._cursor_previous_line(1))
+            return
+
+        rows, cols = np.divmod(changed, max_x)
+        cells = diff[changed]
+        if self.random:
+            alive = cells > 1
+            cells[alive] = np.random.randint(1, len(self.marks), alive.sum())
+
+        # move lines at the first cell of rows from the line under the step
+        new_row = np.ones(changed.size, dtype=bool)
+        new_row[1:] = rows[1:] != rows[:-1]
+        lines = np.diff(np.concatenate(
+            ([max_y + 2], rows[new_row], [max_y + 1])))
+        # move forward at the first cell of runs from the last cell
+        pre_cols = np.roll(cols, 1)
+        pre_cols[new_row] = -2
+        run = new_row.copy()
+        run[1:] |= changed[1:] != changed[:-1] + 1
+        moves = np.full(changed.size, '', dtype=object)
+        moves[run] = self.forwards[(cols[run] - pre_cols[run] - 1) * 2]
+        moves[new_row] = self.line_moves[lines[:-1] + max_y + 2] + \
+            moves[new_row]
+
+        glyphs = self.glyphs[cells]
+        if color_list is not None:
+            # color alive cells only if it is different from previous,
+            # the blank of dead cells looks the same in any color
+            alive = np.flatnonzero(cells > 1)
+            alive_colors = np.asarray(colors).ravel()[changed[alive]] % \
+                len(color_list)
+            code = np.ones(alive.size, dtype=bool)
+            code[1:] = alive_colors[1:] != alive_colors[:-1]
+            codes = np.array(color_list, dtype=object)
+            glyphs[alive[code]] = codes[alive_colors[code]] + \
+                glyphs[alive[code]]
+
+        write = self.buffer.write
+        write(''.join((moves + glyphs).tolist()))
+        write(self.line_moves[lines[-1] + max_y + 2])
 
     def _get_step(self, step):
+        if self.dropped:
+            return '\033[39m' + f'step = {step} (dropped = {self.dropped})\n'
         return '\033[39m' + f'step = {step}\n'
 
 
+class Renderer:
+    # render snapshots of the world on a thread through a bounded queue
+    def __init__(self, console, world, policy='block', size=4):
+        self.console = console
+        self.policy = policy
+        self.queue = Queue(maxsize=size)
+        self.shown = np.array(world, dtype=np.uint8)
+        self.shown_colors = None
+        self.dropped = 0
+        self.error = None
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def push(self, world, step, colors, dropped=0):
+        # dropped is the count of generations not pushed, the error of
+        # the thread is raised instead of queueing for nobody
+        self._check()
+        snapshot = (np.copy(world), step, np.copy(colors), dropped)
+        if self.policy == 'drop':
+            try:
+                self.queue.put_nowait(snapshot)
+                return
+            except Full:
+                pass
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except Empty:
+                pass
+            self.queue.put(snapshot)
+            return
+        while self.thread.is_alive():
+            try:
+                self.queue.put(snapshot, timeout=0.1)
+                return
+            except Full:
+                pass
+        self._check()
+
+    def _check(self):
+        if self.error is not None:
+            raise self.error
+        if not self.thread.is_alive():
+            raise RuntimeError('renderer thread is stopped')
+
+    def close(self):
+        # render the rest and raise the error of the thread if any
+        while self.thread.is_alive():
+            try:
+                self.queue.put(None, timeout=0.1)
+                break
+            except Full:
+                pass
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        try:
+            while (snapshot := self.queue.get()) is not None:
+                world, step, colors, dropped = snapshot
+                # cells reborn in the dropped snapshots have new colors
+                changed = world != self.shown
+                if self.shown_colors is not None:
+                    changed |= (colors != self.shown_colors) & (world != 0)
+                diff_world = (world + 1) * changed
+                self.console.dropped = dropped + self.dropped
+                self.console.update(diff_world, step, colors, world)
+                self.shown, self.shown_colors = world, colors
+        except Exception as e:
+            self.error = e
+
+
+class Engine:
+    # steps the world of the game, subclasses are selected by the name,
+    # auto is False for the engines not measured by engine='auto', and
+    # colored is False for the engines without colors and ages
+    name = None
+    auto = True
+    colored = True
+
+    def __init__(self, game):
+        self.game = game
+
+    def step(self):
+        raise NotImplementedError
+
+    def step_n(self, n):
+        for _ in range(n):
+            self.step()
+
+    def get_state(self):
+        # zero views of colors and ages are shared, not copied
+        game = self.game
+        copy = np.copy if self.colored else np.asarray
+        return {'world': np.copy(game.world), 'colors': copy(game.colors),
+                'ages': copy(game.ages), 'step': game.step}
+
+    def set_state(self, state):
+        # copied into the arrays of the game, which engines may hold
+        game = self.game
+        np.copyto(game.world, state['world'])
+        if self.colored:
+            np.copyto(game.colors, state['colors'])
+            np.copyto(game.ages, state['ages'])
+        game.step = state['step']
+
+    def close(self):
+        # release the resources held by the engine
+        pass
+
+    def _check_moore(self):
+        # the middle cell is not counted by packed cells
+        moore = np.ones((3, 3), dtype=np.uint8)
+        moore[1, 1] = 0
+        game = self.game
+        if game.kernel.shape != moore.shape or (game.kernel != moore).any():
+            raise ValueError(f'{self.name} engine is only for moore '
+                             'neighborhood')
+
+
+class KernelEngine(Engine):
+    # around cells by the kernel of the game, open-cv is imported unless
+    # around_cells and max_colors are overridden
+    uses_cv2 = True
+
+    def __init__(self, game):
+        super().__init__(game)
+        if self.uses_cv2:
+            _import_cv2()
+        # fft is faster than direct filtering from radius 10
+        self.fft = game.radius >= 10
+        self._fft_kernels = {}
+        self._dilate_kernel = (game.kernel > 0).astype(np.uint8)
+        self.around_dtype = np.uint8 if game.max_around < 256 else np.uint16
+        # index of rule table may not fit in uint8
+        size = game.rule.table.size
+        self.index_dtype = np.uint8 if size <= 256 else \
+            np.uint16 if size <= 65536 else np.uint32
+
+    def around_cells(self, pre_cells, dst=None):
+        # weighted sum of around cells inside of the halo
+        r = self.game.radius
+        if self.fft:
+            return self._convolve_fft(pre_cells)
+        depth = -1 if self.around_dtype == np.uint8 else cv2.CV_16U
+        around_cells = cv2.filter2D(pre_cells, depth, self.game.kernel,
+                                    dst=dst, borderType=cv2.BORDER_ISOLATED)
+        return around_cells[r:-r, r:-r]
+
+    def max_colors(self, pre_colors, dst=None):
+        # max of around colors inside of the halo
+        r = self.game.radius
+        max_colors = cv2.dilate(pre_colors, self._dilate_kernel, dst=dst,
+                                borderType=cv2.BORDER_ISOLATED)
+        return max_colors[r:-r, r:-r]
+
+    def _convolve_fft(self, pre_cells):
+        r, shape = self.game.radius, pre_cells.shape
+        kernel = self._fft_kernels.get(shape)
+        if kernel is None:
+            # flipped to correlate like filter2D
+            size = self.game.kernel.shape[0]
+            kernel = np.zeros(shape)
+            kernel[:size, :size] = self.game.kernel[::-1, ::-1]
+            kernel = self._fft_kernels[shape] = np.fft.rfft2(kernel)
+        around_cells = np.fft.irfft2(np.fft.rfft2(pre_cells) * kernel, s=shape)
+        return np.rint(around_cells[r * 2:, r * 2:]).astype(self.around_dtype)
+
+    def _lookup(self, states, around_cells):
+        # next states by the flat index of rule table
+        table = self.game.rule.table
+        index = states.astype(self.index_dtype)
+        index *= self.index_dtype(table.shape[1])
+        index += around_cells
+        return np.take(table, index)
+
+    def _compute(self, pre_cells, pre_colors, ages):
+        # next world, colors and ages inside of the halo
+        game, r = self.game, self.game.radius
+        around_cells = self.around_cells(pre_cells)
+        max_colors = self.max_colors(pre_colors)
+
+        # remove around
+        pre_cells = pre_cells[r:-r, r:-r]
+        pre_colors = pre_colors[r:-r, r:-r]
+
+        # get alive and born
+        states = ages if game.rule.states > 2 else pre_cells
+        next_states = self._lookup(states, around_cells)
+        next_cells = next_states == 1
+        alive = next_cells & (pre_cells == 1)
+        born = next_cells & (states == 0)
+
+        world = next_states
+        colors = alive * pre_colors + born * (max_colors + 1)
+
+        if game.rule.states > 2:
+            # display states by lookup table
+            ages = next_states
+            world = game.age_lut[ages]
+
+        if game.mortal:
+            # aging by lookup table
+            np.copyto(world, game.age_lut[ages], where=alive)
+            ages = (ages + 1) * (world != 0)
+
+        return world, colors, ages
+
+    def _cells(self, world):
+        # alive cells of world as 0 or 1
+        if self.game.rule.states > 2:
+            return (world == 1).astype(np.uint8)
+        return (world >= 1).astype(np.uint8)
+
+    def _halo(self, array, y0, y1, x0, x1):
+        # block with radius cells around
+        game, r = self.game, self.game.radius
+        if game.torus:
+            rows = np.arange(y0 - r, y1 + r) % game.y
+            cols = np.arange(x0 - r, x1 + r) % game.x
+            return array[np.ix_(rows, cols)]
+        block = np.zeros((y1 - y0 + r * 2, x1 - x0 + r * 2), dtype=array.dtype)
+        top, left = max(y0 - r, 0), max(x0 - r, 0)
+        bottom, right = min(y1 + r, game.y), min(x1 + r, game.x)
+        block[top - y0 + r:bottom - y0 + r, left - x0 + r:right - x0 + r] = \
+            array[top:bottom, left:right]
+        return block
+
+
+class OpenCVEngine(KernelEngine):
+    # whole world in the buffers of the engine, swapped every generation
+    name = 'opencv'
+
+    def __init__(self, game):
+        super().__init__(game)
+        y, x = game.world.shape
+        r = game.radius
+        self._pre_cells = np.zeros((y + r * 2, x + r * 2), dtype=np.uint8)
+        self._pre_colors = np.zeros_like(self._pre_cells)
+        self._around = np.empty(self._pre_cells.shape,
+                                dtype=self.around_dtype)
+        self._max_colors = np.empty_like(self._pre_colors)
+        self._alive = np.empty((y, x), dtype=bool)
+        self._born = np.empty_like(self._alive)
+        self._mask = np.empty_like(self._alive)
+        self._next_states = np.empty_like(game.world)
+        self._aged = np.empty_like(game.world)
+        self._index = np.empty((y, x), dtype=self.index_dtype)
+        self._next_world = np.empty_like(game.world)
+        game.diff_world = np.zeros_like(game.world)
+
+    def step(self, diff=True):
+        # get previous
+        game = self.game
+        pre_world = game.world
+        pre_cells, pre_colors = self._pre_cells, self._pre_colors
+        r = game.radius
+        cells, colors = pre_cells[r:-r, r:-r], pre_colors[r:-r, r:-r]
+        if game.rule.states > 2:
+            # ages hold the states of generations rule
+            states = game.ages
+            np.equal(pre_world, 1, out=cells)
+        else:
+            states = cells
+            np.minimum(pre_world, 1, out=cells)
+        np.copyto(colors, game.colors)
+
+        if game.torus:
+            # wrap around
+            self._wrap(pre_cells)
+            self._wrap(pre_colors)
+
+        # get alive and born
+        around_cells = self.around_cells(pre_cells, self._around)
+        max_colors = self.max_colors(pre_colors, self._max_colors)
+
+        # look up rule table by (state, around cells)
+        alive, born = self._alive, self._born
+        next_states, mask = self._next_states, self._mask
+        index = self._index
+        width = index.dtype.type(game.rule.table.shape[1])
+        np.multiply(states, width, out=index)
+        np.add(index, around_cells, out=index)
+        np.take(game.rule.table, index, out=next_states)
+        np.equal(next_states, 1, out=mask)
+        np.logical_and(mask, cells, out=alive)
+        np.equal(states, 0, out=born)
+        np.logical_and(born, mask, out=born)
+
+        # update next cells
+        world = self._next_world
+        np.multiply(colors, alive, out=game.colors)
+        np.add(max_colors, 1, out=game.colors, where=born)
+
+        if game.rule.states > 2:
+            # display states by lookup table
+            np.copyto(game.ages, next_states)
+            np.take(game.age_lut, game.ages, out=world)
+        else:
+            np.copyto(world, next_states)
+
+        if game.mortal:
+            # aging by lookup table
+            ages = game.ages
+            np.take(game.age_lut, ages, out=self._aged)
+            np.copyto(world, self._aged, where=alive)
+            np.not_equal(world, 0, out=mask)
+            np.add(ages, 1, out=ages)
+            np.multiply(ages, mask, out=ages)
+
+        # erase same cells
+        if diff:
+            np.add(world, 1, out=game.diff_world)
+            np.equal(world, pre_world, out=mask)
+            np.copyto(game.diff_world, 0, where=mask)
+
+        # swap buffers
+        game.world, self._next_world = world, pre_world
+
+        game.step += 1
+
+    def step_n(self, n, depth=4, band=None):
+        # plain worlds are stepped by bands of cache size for depth
+        # generations at once, the others without the diffs but the last
+        if n <= 0:
+            return
+        game = self.game
+        if game.mortal or game.color_type is not None or \
+                game.rule.states > 2:
+            for _ in range(n - 1):
+                self.step(diff=False)
+        else:
+            self._step_blocked(n - 1, depth, band)
+        self.step()
+
+    def _step_blocked(self, n, depth=4, band=None):
+        # each band is stepped from the rows of radius * generations
+        # around, which shrink by the radius every generation
+        game = self.game
+        r, x, y = game.radius, game.x, game.y
+        if band is None:
+            band = max((1 << 20) // x, 1)
+        mode = 'wrap' if game.torus else 'constant'
+        while n > 0:
+            generations = min(depth, n)
+            halo = r * generations
+            world = self._next_world
+            for y0 in range(0, y, band):
+                y1 = min(y0 + band, y)
+                rows = np.arange(y0 - halo, y1 + halo)
+                if game.torus:
+                    cells = game.world[rows % y]
+                else:
+                    inside = (rows >= 0) & (rows < y)
+                    cells = game.world[np.clip(rows, 0, y - 1)]
+                    cells[~inside] = 0
+                for _ in range(generations):
+                    rows = rows[r:-r]
+                    pre_cells = np.pad(cells, ((0, 0), (r, r)), mode=mode)
+                    cells = self._lookup(cells[r:-r],
+                                         self.around_cells(pre_cells))
+                    if not game.torus:
+                        # cells out of the world are never alive
+                        cells[(rows < 0) | (rows >= y)] = 0
+                world[y0:y1] = cells
+            game.world, self._next_world = world, game.world
+            game.step += generations
+            n -= generations
+
+    def _wrap(self, padded):
+        game, r = self.game, self.game.radius
+        if r > game.y or r > game.x:
+            padded[...] = np.pad(padded[r:-r, r:-r], r, 'wrap')
+            return
+        padded[:r, r:-r] = padded[-r * 2:-r, r:-r]
+        padded[-r:, r:-r] = padded[r:r * 2, r:-r]
+        padded[:, :r] = padded[:, -r * 2:-r]
+        padded[:, -r:] = padded[:, r:r * 2]
+
+
+class NumpyEngine(OpenCVEngine):
+    # slices of the runs in kernel rows instead of open-cv, the middle is
+    # summed as 1 and removed after
+    name = 'numpy'
+    uses_cv2 = False
+
+    def __init__(self, game):
+        super().__init__(game)
+        kernel = game.kernel.copy()
+        kernel[game.radius, game.radius] = 1
+        self._sum_runs = self._kernel_runs(kernel)
+        self._max_runs = self._kernel_runs(game.kernel > 0)
+
+    def around_cells(self, pre_cells, dst=None):
+        if self.fft:
+            return self._convolve_fft(pre_cells)
+        return self._sum_slices(pre_cells)
+
+    def max_colors(self, pre_colors, dst=None):
+        return self._max_slices(pre_colors)
+
+    def _kernel_runs(self, kernel):
+        # runs of same weights in kernel rows as (weight, row, start, end)
+        runs = []
+        for dy, row in enumerate(kernel):
+            x0 = 0
+            for x1 in range(1, len(row) + 1):
+                if x1 == len(row) or row[x1] != row[x0]:
+                    if row[x0]:
+                        runs.append((int(row[x0]), dy, x0, x1))
+                    x0 = x1
+        return runs
+
+    def _sum_slices(self, pre_cells):
+        # sums of the runs in rows, then added by rows of the kernel,
+        # wrapped in the dtype until the sum fits in it
+        r, dtype = self.game.radius, self.around_dtype
+        y, x = pre_cells.shape[0] - r * 2, pre_cells.shape[1] - r * 2
+        sums, rows = None, {}
+        around_cells = np.zeros((y, x), dtype=dtype)
+        for weight, dy, x0, x1 in self._sum_runs:
+            row = rows.get((x0, x1))
+            if row is None:
+                if x1 - x0 <= 3:
+                    row = pre_cells[:, x0:x0 + x].astype(dtype)
+                    for dx in range(x0 + 1, x1):
+                        row += pre_cells[:, dx:dx + x]
+                else:
+                    if sums is None:
+                        sums = np.zeros((len(pre_cells), x + r * 2 + 1),
+                                        dtype=dtype)
+                        np.cumsum(pre_cells, axis=1, dtype=dtype,
+                                  out=sums[:, 1:])
+                    row = sums[:, x1:x1 + x] - sums[:, x0:x0 + x]
+                rows[x0, x1] = row
+            if weight == 1:
+                around_cells += row[dy:dy + y]
+            else:
+                around_cells += row[dy:dy + y] * dtype(weight)
+        if self.game.kernel[r, r] == 0:
+            around_cells -= pre_cells[r:-r, r:-r]
+        return around_cells
+
+    def _max_slices(self, pre_colors):
+        # max of the runs in rows by overlapped spans of powers of 2
+        r = self.game.radius
+        y, x = pre_colors.shape[0] - r * 2, pre_colors.shape[1] - r * 2
+        spans, rows = {1: pre_colors}, {}
+        max_colors = np.zeros((y, x), dtype=np.uint8)
+        for _, dy, x0, x1 in self._max_runs:
+            row = rows.get((x0, x1))
+            if row is None:
+                span = 1 << ((x1 - x0).bit_length() - 1)
+                while span not in spans:
+                    half = max(spans)
+                    spans[half * 2] = np.maximum(spans[half][:, :-half],
+                                                 spans[half][:, half:])
+                row = rows[x0, x1] = np.maximum(
+                    spans[span][:, x0:x0 + x],
+                    spans[span][:, x1 - span:x1 - span + x])
+            np.maximum(max_colors, row[dy:dy + y], out=max_colors)
+        return max_colors
+
+
+class BitEngine(Engine):
+    # only the packed cells of the last two generations are kept, the
+    # world and the diff are unpacked when they are read
+    name = 'bit'
+    colored = False
+
+    def __init__(self, game):
+        super().__init__(game)
+        self._check_moore()
+        if game.mortal or game.color_type is not None:
+            raise ValueError('bit engine is only for non-mortal and '
+                             'non-color runs')
+        self.bit_life = BitLife(game.world, game.torus, game.rule)
+        self._pre_cells = self.bit_life.cells
+        game.world = game.diff_world = None
+        game._packed = True
+
+    def step(self):
+        game = self.game
+        self._pre_cells = self.bit_life.cells
+        self.bit_life.step()
+        game.world = game.diff_world = None
+        game._packed = True
+        game.step += 1
+
+    def step_n(self, n):
+        # the last generation is stepped alone for the diff
+        if n <= 0:
+            return
+        self.bit_life.step(n - 1)
+        self.game.step += n - 1
+        self.step()
+
+    def set_state(self, state):
+        game = self.game
+        self.bit_life.cells = self._pre_cells = \
+            self.bit_life.pack(state['world'])
+        game.world = game.diff_world = None
+        game._packed = True
+        game.step = state['step']
+
+    def unpack(self):
+        game = self.game
+        game._packed = False
+        world = self.bit_life.unpack()
+        # cells changed from the previous generation
+        changed = self.bit_life.unpack(self._pre_cells ^ self.bit_life.cells)
+        game.world = world
+        game.diff_world = (world + 1) * changed
+
+
+class HashLifeEngine(Engine):
+    # the plane is unbounded, so cells leave the world instead of dying
+    # on the edges like the other engines
+    name = 'hashlife'
+    auto = False
+    colored = False
+
+    def __init__(self, game):
+        super().__init__(game)
+        self._check_moore()
+        if game.torus or game.mortal or game.color_type is not None:
+            raise ValueError('hashlife engine is only for non-torus, '
+                             'non-mortal and non-color runs')
+        self.hashlife = HashLife(game.world, game.rule)
+        game.diff_world = np.zeros_like(game.world)
+
+    def step(self):
+        game = self.game
+        pre_world = game.world
+        self.hashlife.advance(1)
+        game.world = self.hashlife.world()
+        # erase same cells
+        game.diff_world = game.world + 1
+        game.diff_world[game.world == pre_world] = 0
+        game.step += 1
+
+    def step_n(self, n):
+        # jump the generations but the last one, which is diffed
+        if n <= 0:
+            return
+        game = self.game
+        self.hashlife.advance(n - 1)
+        game.world = self.hashlife.world()
+        game.step += n - 1
+        self.step()
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.hashlife = HashLife(self.game.world, self.game.rule)
+
+
+class SparseEngine(KernelEngine):
+    # compute only the tiles around changed tiles
+    name = 'sparse'
+
+    def __init__(self, game):
+        if 0 in game.rule.born:
+            raise ValueError('sparse engine is not for B0 rules')
+        super().__init__(game)
+        self.tile = 32
+        tiles_y = (game.y + self.tile - 1) // self.tile
+        tiles_x = (game.x + self.tile - 1) // self.tile
+        self.active = np.ones((tiles_y, tiles_x), dtype=bool)
+        self.blocks = []
+        game.diff_world = np.zeros_like(game.world)
+
+    def step(self):
+        game = self.game
+        pre_world = game.world
+        results = []
+        for y0, y1, x0, x1 in self._active_blocks():
+            pre_cells = self._cells(self._halo(pre_world, y0, y1, x0, x1))
+            pre_colors = self._halo(game.colors, y0, y1, x0, x1)
+            results.append((y0, y1, x0, x1, *self._compute(
+                pre_cells, pre_colors, game.ages[y0:y1, x0:x1])))
+
+        # erase previous diff
+        for y0, y1, x0, x1 in self.blocks:
+            game.diff_world[y0:y1, x0:x1] = 0
+        self.blocks = []
+
+        tile = self.tile
+        changed = np.zeros_like(self.active)
+        for y0, y1, x0, x1, world, colors, ages in results:
+            diff_world = world + 1
+            diff_world[world == pre_world[y0:y1, x0:x1]] = 0
+            game.world[y0:y1, x0:x1] = world
+            game.colors[y0:y1, x0:x1] = colors
+            game.diff_world[y0:y1, x0:x1] = diff_world
+            self.blocks.append((y0, y1, x0, x1))
+
+            # aging and dying cells also change in the next generation
+            dirty = diff_world.any(axis=0)
+            if game.mortal:
+                game.ages[y0:y1, x0:x1] = ages
+                dirty |= world.any(axis=0)
+            elif game.rule.states > 2:
+                game.ages[y0:y1, x0:x1] = ages
+                dirty |= (ages > 1).any(axis=0)
+            offsets = np.arange(0, x1 - x0, tile)
+            changed[y0 // tile, x0 // tile:(x1 + tile - 1) // tile] = \
+                np.logical_or.reduceat(dirty, offsets)
+
+        # changes reach the next tiles
+        pad_type = 'wrap' if game.torus else 'constant'
+        for _ in range(-(-game.radius // tile)):
+            changed = np.pad(changed, 1, pad_type)
+            self.active[...] = False
+            for dy in range(3):
+                for dx in range(3):
+                    self.active |= changed[dy:dy + self.active.shape[0],
+                                           dx:dx + self.active.shape[1]]
+            changed = self.active.copy()
+
+        game.step += 1
+
+    def set_state(self, state):
+        super().set_state(state)
+        self.active[...] = True
+
+    def _active_blocks(self):
+        # join active tiles next to each other in a row
+        game, tile = self.game, self.tile
+        for ty, row in enumerate(self.active):
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], row, [0]))))
+            y0, y1 = ty * tile, min((ty + 1) * tile, game.y)
+            for start, end in zip(edges[::2], edges[1::2]):
+                yield y0, y1, start * tile, min(end * tile, game.x)
+
+
+class ParallelEngine(KernelEngine):
+    # bands share the arrays, since open-cv and numpy release the GIL
+    name = 'parallel'
+
+    def __init__(self, game):
+        super().__init__(game)
+        self.workers = game.workers if game.workers else os.cpu_count()
+        self.pool = ThreadPoolExecutor(self.workers)
+        count = max(min(self.workers, game.y // 16), 1)
+        edges = np.linspace(0, game.y, count + 1).astype(int)
+        self.bands = list(zip(edges[:-1], edges[1:]))
+        self.buffers = (np.empty_like(game.world),
+                        np.empty_like(game.colors),
+                        np.empty_like(game.ages))
+        game.diff_world = np.zeros_like(game.world)
+
+    def step(self):
+        # step bands with one row around on the pool into the other buffers
+        game = self.game
+        pre_world, pre_colors, pre_ages = game.world, game.colors, game.ages
+        world, colors, ages = self.buffers
+        diff_world = game.diff_world
+        aging = game.mortal or game.rule.states > 2
+
+        def update_band(band):
+            y0, y1 = band
+            pre_cells = self._cells(self._halo(pre_world, y0, y1, 0, game.x))
+            next_world, next_colors, next_ages = self._compute(
+                pre_cells, self._halo(pre_colors, y0, y1, 0, game.x),
+                pre_ages[y0:y1])
+            world[y0:y1] = next_world
+            colors[y0:y1] = next_colors
+            if aging:
+                ages[y0:y1] = next_ages
+            np.add(next_world, 1, out=diff_world[y0:y1])
+            diff_world[y0:y1][next_world == pre_world[y0:y1]] = 0
+
+        for _ in self.pool.map(update_band, self.bands):
+            pass
+
+        # swap buffers
+        if aging:
+            self.buffers = (pre_world, pre_colors, pre_ages)
+            game.ages = ages
+        else:
+            self.buffers = (pre_world, pre_colors, ages)
+        game.world, game.colors = world, colors
+
+        game.step += 1
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class MemmapEngine(KernelEngine):
+    # step the world in place by bands, the rows around the band are
+    # kept as they were in the previous generation
+    name = 'memmap'
+    auto = False
+    colored = False
+
+    def __init__(self, game):
+        if not game.headless or game.mortal or \
+                game.color_type is not None or game.rule.states > 2:
+            raise ValueError('memmap engine is only for headless, '
+                             'non-mortal and non-color runs of 2 states')
+        super().__init__(game)
+        # rows of a band to step about 16M cells at once
+        self.band = max(game.radius, (1 << 24) // game.x)
+
+    def step(self):
+        # the header is dirty until the bands are all stepped, a state
+        # file of a step stopped halfway is not opened again
+        game = self.game
+        game._sync_state(dirty=True)
+        world, r, band = game.world, game.radius, self.band
+        mode = 'wrap' if game.torus else 'constant'
+        first = np.array(world[:r])
+        above = np.array(world[-r:]) if game.torus else np.zeros_like(first)
+        for y0 in range(0, game.y, band):
+            y1 = min(y0 + band, game.y)
+            below = world[y1:y1 + r]
+            if len(below) < r:
+                rest = first if game.torus else np.zeros_like(first)
+                below = np.concatenate([below, rest[:r - len(below)]])
+            cells = world[y0:y1]
+            pre_cells = np.pad(np.concatenate([above, cells, below]),
+                               ((0, 0), (r, r)), mode=mode)
+            around_cells = self.around_cells(pre_cells)
+            next_cells = self._lookup(cells, around_cells)
+            above = np.array(world[y1 - r:y1])
+            world[y0:y1] = next_cells
+        game.step += 1
+        game._sync_state()
+
+
+ENGINES = {engine.name: engine for engine in (
+    OpenCVEngine, NumpyEngine, BitEngine, HashLifeEngine, SparseEngine,
+    ParallelEngine, MemmapEngine)}
+
+
+class Rule:
+    # outer totalistic rule like 'B3/S23', 'B36/S23' or '23/3' (S/B),
+    # generations rule like 'B2/S/C3' or '/2/3' (S/B/C),
+    # and larger than life rule like 'R5,C0,M1,S34..58,B34..45,NM'
+    neighborhoods = {'M': 'moore', 'N': 'neumann', 'C': 'circular'}
+
+    def __init__(self, rule='B3/S23'):
+        self.neighborhood, self.middle = None, 0
+        if rule.strip()[:1] in ('R', 'r'):
+            self._parse_ltl(rule)
+        else:
+            self.born, self.survive, self.states = self._parse(rule)
+        self.table = self.make_table()
+
+    def __str__(self):
+        if self.neighborhood is not None:
+            radius = self.neighborhood.lstrip('abcdefghijklmnopqrstuvwxyz')
+            letter = {v: k for k, v in self.neighborhoods.items()}[
+                self.neighborhood[:-len(radius)]]
+            states = self.states if self.states > 2 else 0
+            return (f'R{radius},C{states},M{self.middle},'
+                    f'S{self._ranges(self.survive)},'
+                    f'B{self._ranges(self.born)},N{letter}')
+        born = ''.join(str(count) for count in sorted(self.born))
+        survive = ''.join(str(count) for count in sorted(self.survive))
+        if self.states > 2:
+            return f'B{born}/S{survive}/C{self.states}'
+        return f'B{born}/S{survive}'
+
+    def make_table(self, max_around=8):
+        # next state by (state, around cells), dying states count up
+        width = max(max_around, 8) + 1
+        table = np.zeros((self.states, width), dtype=np.uint8)
+        table[0, [count for count in self.born if count < width]] = 1
+        table[1] = 2 if self.states > 2 else 0
+        table[1, [count for count in self.survive if count < width]] = 1
+        for state in range(2, self.states):
+            table[state] = (state + 1) % self.states
+        return table
+
+    def _parse(self, rule):
+        parts = rule.strip().upper().split('/')
+        if len(parts) not in (2, 3):
+            raise ValueError(f'invalid rule : {rule}')
+        if all(part[:1] in ('B', 'S', 'C', 'G') for part in parts):
+            counts = {part[0].replace('G', 'C'): part[1:] for part in parts}
+            if len(counts) != len(parts) or \
+                    'B' not in counts or 'S' not in counts:
+                raise ValueError(f'invalid rule : {rule}')
+            born, survive = counts['B'], counts['S']
+            states = counts.get('C', '2')
+        elif len(parts) == 2:
+            survive, born = parts
+            states = '2'
+        else:
+            survive, born, states = parts
+        counts = born + survive
+        if counts and not counts.isdigit() or '9' in counts or \
+                not states.isdigit() or not 2 <= int(states) <= 255:
+            raise ValueError(f'invalid rule : {rule}')
+        return set(map(int, born)), set(map(int, survive)), int(states)
+
+    def _parse_ltl(self, rule):
+        settings = {'R': '1', 'C': '0', 'M': '0', 'N': 'M', 'S': [], 'B': []}
+        key = None
+        try:
+            for token in rule.strip().upper().split(','):
+                if token[:1].isalpha():
+                    key, token = token[0], token[1:]
+                if key in ('S', 'B'):
+                    if token:
+                        settings[key].append(token)
+                elif key in settings and token:
+                    settings[key] = token
+                else:
+                    raise ValueError
+            radius, states = int(settings['R']), int(settings['C'])
+            self.middle = int(settings['M'])
+            self.born = self._counts(settings['B'])
+            self.survive = self._counts(settings['S'])
+            self.neighborhood = self.neighborhoods[settings['N']] + str(radius)
+        except (ValueError, KeyError):
+            raise ValueError(f'invalid rule : {rule}') from None
+        if radius < 1 or self.middle not in (0, 1) or not states < 256:
+            raise ValueError(f'invalid rule : {rule}')
+        self.states = max(states, 2)
+
+    def _counts(self, ranges):
+        counts = set()
+        for count in ranges:
+            start, _, end = count.partition('..')
+            counts |= set(range(int(start), int(end or start) + 1))
+        return counts
+
+    def _ranges(self, counts):
+        ranges, counts = [], sorted(counts)
+        for count in counts:
+            if ranges and ranges[-1][1] == count - 1:
+                ranges[-1][1] = count
+            else:
+                ranges.append([count, count])
+        return ','.join(f'{start}..{end}' if start != end else f'{start}'
+                        for start, end in ranges)
+
+
+class BitLife:
+    # life-like rule on bit-packed cells (64 cells per word, little-endian)
+    def __init__(self, world, torus=False, rule=None):
+        world = np.asarray(world)
+        self.y, self.x = world.shape
+        self.torus = torus
+        self.rule = rule if rule is not None else Rule()
+        if self.rule.states > 2:
+            raise ValueError('bit engine is not for generations rules')
+        self.words = (self.x + 63) // 64
+        self.last_bit = np.uint64((self.x - 1) % 64)
+        self.mask = np.uint64((1 << ((self.x - 1) % 64 + 1)) - 1)
+        self.cells = self.pack(world)
+
+    def pack(self, world):
+        bits = np.packbits(np.asarray(world) > 0, axis=1, bitorder='little')
+        packed = np.zeros((self.y, self.words * 8), dtype=np.uint8)
+        packed[:, :bits.shape[1]] = bits
+        return packed.view('<u8')
+
+    def unpack(self, cells=None):
+        cells = self.cells if cells is None else cells
+        return np.unpackbits(cells.view(np.uint8), axis=1,
+                             count=self.x, bitorder='little')
+
+    def step(self, n=1):
+        for _ in range(n):
+            self.cells = self._next(self.cells)
+
+    def _next(self, cells):
+        up, down = self._shift_rows(cells)
+        # count neighbors with bitwise adder
+        sums = [np.zeros_like(cells) for _ in range(4)]
+        carry = np.empty_like(cells)
+        for row, center in ((up, True), (cells, False), (down, True)):
+            west, east = self._shift_cols(row)
+            neighbors = (west, row, east) if center else (west, east)
+            for neighbor in neighbors:
+                np.copyto(carry, neighbor)
+                for s in sums:
+                    s ^= carry
+                    carry &= ~s
+
+        born = self._match(sums, self.rule.born) & ~cells
+        alive = self._match(sums, self.rule.survive) & cells
+        next_cells = born | alive
+        next_cells[:, -1] &= self.mask
+        return next_cells
+
+    def _match(self, sums, counts):
+        matched = np.zeros_like(sums[0])
+        for count in counts:
+            bits = ~np.zeros_like(matched)
+            for i, s in enumerate(sums):
+                bits &= s if count >> i & 1 else ~s
+            matched |= bits
+        return matched
+
+    def _shift_rows(self, cells):
+        if self.torus:
+            return np.roll(cells, 1, axis=0), np.roll(cells, -1, axis=0)
+        up = np.zeros_like(cells)
+        down = np.zeros_like(cells)
+        up[1:] = cells[:-1]
+        down[:-1] = cells[1:]
+        return up, down
+
+    def _shift_cols(self, row):
+        one, top = np.uint64(1), np.uint64(63)
+        # west[x] = row[x - 1], east[x] = row[x + 1]
+        west = row << one
+        west[:, 1:] |= row[:, :-1] >> top
+        east = row >> one
+        east[:, :-1] |= row[:, 1:] << top
+        if self.torus:
+            last_bit = self.last_bit
+            west[:, 0] |= (row[:, -1] >> last_bit) & one
+            east[:, -1] |= (row[:, 0] & one) << last_bit
+        return west, east
+
+
+class QuadNode:
+    __slots__ = ('level', 'population', 'nw', 'ne', 'sw', 'se')
+
+    def __init__(self, level, population, nw=None, ne=None, sw=None,
+                 se=None):
+        self.level = level
+        self.population = population
+        self.nw, self.ne, self.sw, self.se = nw, ne, sw, se
+
+
+class HashLife:
+    # life-like rule on the unbounded plane with a memoized quadtree.
+    # cells leaving the board keep living outside of it.
+    def __init__(self, world, rule=None, cache_size=1 << 19):
+        self.rule = rule if rule is not None else Rule()
+        if 0 in self.rule.born or self.rule.states > 2:
+            raise ValueError('hashlife engine is not for B0 and '
+                             'generations rules')
+        self.cache_size = cache_size
+        self._nodes = OrderedDict()
+        self._results = OrderedDict()
+        self._off = QuadNode(0, 0)
+        self._on = QuadNode(0, 1)
+        self._empties = [self._off]
+
+        world = np.asarray(world) > 0
+        self.y, self.x = world.shape
+        # root covers [-2^(level-1), 2^(level-1)) and the board is at (0, 0)
+        level = max(3, (max(self.x, self.y) - 1).bit_length() + 1)
+        half = 1 << (level - 1)
+        self.root = self._build(world, level, -half, -half)
+        self.generation = 0
+        self._initial = self.root
+
+    @property
+    def population(self):
+        return self.root.population
+
+    def advance(self, generations):
+        self.root = self._advance(self.root, generations)
+        self.generation += generations
+
+    def world(self):
+        return self._to_world(self.root)
+
+    def world_at(self, generation):
+        # query any generation without changing the current one
+        root, start = self.root, self.generation
+        if generation < start:
+            root, start = self._initial, 0
+        return self._to_world(self._advance(root, generation - start))
+
+    def _advance(self, root, generations):
+        for j in reversed(range(generations.bit_length())):
+            if generations >> j & 1:
+                while root.level < j + 2 or not self._is_padded(root):
+                    root = self._centre(root)
+                root = self._successor(self._centre(root), j)
+        return root
+
+    def _join(self, nw, ne, sw, se):
+        key = (nw, ne, sw, se)
+        node = self._nodes.get(key)
+        if node is not None:
+            self._nodes.move_to_end(key)
+            return node
+        population = (nw.population + ne.population +
+                      sw.population + se.population)
+        node = QuadNode(nw.level + 1, population, nw, ne, sw, se)
+        self._nodes[key] = node
+        if len(self._nodes) > self.cache_size:
+            self._nodes.popitem(last=False)
+        return node
+
+    def _empty(self, level):
+        while len(self._empties) <= level:
+            e = self._empties[-1]
+            self._empties.append(self._join(e, e, e, e))
+        return self._empties[level]
+
+    def _centre(self, node):
+        e = self._empty(node.level - 1)
+        return self._join(self._join(e, e, e, node.nw),
+                          self._join(e, e, node.ne, e),
+                          self._join(e, node.sw, e, e),
+                          self._join(node.se, e, e, e))
+
+    def _is_padded(self, node):
+        # all cells are in the centre half
+        return (node.nw.population == node.nw.se.population and
+                node.ne.population == node.ne.sw.population and
+                node.sw.population == node.sw.ne.population and
+                node.se.population == node.se.nw.population)
+
+    def _successor(self, node, j):
+        # centre of node after 2^j generations (j <= level - 2)
+        key = (node, j)
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            return result
+
+        join, successor = self._join, self._successor
+        if node.population == 0:
+            result = node.nw
+        elif node.level == 2:
+            result = self._life_4x4(node)
+        else:
+            nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+            c1 = successor(join(nw.nw, nw.ne, nw.sw, nw.se), j)
+            c2 = successor(join(nw.ne, ne.nw, nw.se, ne.sw), j)
+            c3 = successor(join(ne.nw, ne.ne, ne.sw, ne.se), j)
+            c4 = successor(join(nw.sw, nw.se, sw.nw, sw.ne), j)
+            c5 = successor(join(nw.se, ne.sw, sw.ne, se.nw), j)
+            c6 = successor(join(ne.sw, ne.se, se.nw, se.ne), j)
+            c7 = successor(join(sw.nw, sw.ne, sw.sw, sw.se), j)
+            c8 = successor(join(sw.ne, se.nw, sw.se, se.sw), j)
+            c9 = successor(join(se.nw, se.ne, se.sw, se.se), j)
+            if j < node.level - 2:
+                # take the centres without stepping any further
+                result = join(join(c1.se, c2.sw, c4.ne, c5.nw),
+                              join(c2.se, c3.sw, c5.ne, c6.nw),
+                              join(c4.se, c5.sw, c7.ne, c8.nw),
+                              join(c5.se, c6.sw, c8.ne, c9.nw))
+            else:
+                result = join(successor(join(c1, c2, c4, c5), j),
+                              successor(join(c2, c3, c5, c6), j),
+                              successor(join(c4, c5, c7, c8), j),
+                              successor(join(c5, c6, c8, c9), j))
+
+        self._results[key] = result
+        if len(self._results) > self.cache_size:
+            self._results.popitem(last=False)
+        return result
+
+    def _life_4x4(self, node):
+        cells = [[0] * 4 for _ in range(4)]
+        for child, y, x in ((node.nw, 0, 0), (node.ne, 0, 2),
+                            (node.sw, 2, 0), (node.se, 2, 2)):
+            cells[y][x] = child.nw.population
+            cells[y][x + 1] = child.ne.population
+            cells[y + 1][x] = child.sw.population
+            cells[y + 1][x + 1] = child.se.population
+
+        nexts = []
+        for y, x in ((1, 1), (1, 2), (2, 1), (2, 2)):
+            count = sum(cells[y + dy][x + dx]
+                        for dy in (-1, 0, 1) for dx in (-1, 0, 1))
+            count -= cells[y][x]
+            alive = self.rule.table[cells[y][x], count]
+            nexts.append(self._on if alive else self._off)
+        return self._join(*nexts)
+
+    def _build(self, world, level, top, left):
+        size = 1 << level
+        region = world[max(top, 0):max(top + size, 0),
+                       max(left, 0):max(left + size, 0)]
+        if not region.any():
+            return self._empty(level)
+        if level == 0:
+            return self._on
+        half = size >> 1
+        build = self._build
+        return self._join(build(world, level - 1, top, left),
+                          build(world, level - 1, top, left + half),
+                          build(world, level - 1, top + half, left),
+                          build(world, level - 1, top + half, left + half))
+
+    def _to_world(self, root):
+        world = np.zeros((self.y, self.x), dtype=np.uint8)
+        half = 1 << (root.level - 1)
+        self._draw(root, -half, -half, world)
+        return world
+
+    def _draw(self, node, top, left, world):
+        size = 1 << node.level
+        if not node.population or top >= self.y or left >= self.x or \
+                top + size <= 0 or left + size <= 0:
+            return
+        if node.level == 0:
+            world[top, left] = 1
+            return
+        half = size >> 1
+        self._draw(node.nw, top, left, world)
+        self._draw(node.ne, top, left + half, world)
+        self._draw(node.sw, top + half, left, world)
+        self._draw(node.se, top + half, left + half, world)
+
+
 if __name__ == '__main__':
     import argparse
+
+    def neighborhood(value):
+        # name like 'moore5' or weights as json
+        return json.loads(value) if value.startswith('[') else value
+
     parser = argparse.ArgumentParser(
                 description="Conway's Game of Life simulator on CLI")
 
     # requied arg
     parser.add_argument('sample', nargs='?')
     # requied optional text arg
-    options = (('-n', '--name'), ('-j', '--json'), ('-a', '--alive'))
+    options = (('-n', '--name'), ('-j', '--json'), ('-a', '--alive'),
+               ('-o', '--output'), ('-sf', '--state-file'))
     for option in options:
         parser.add_argument(*option)
+    engines = ('opencv', 'numpy', 'bit', 'hashlife', 'sparse', 'parallel',
+               'memmap', 'auto')
+    parser.add_argument('-e', '--engine', choices=engines)
+    parser.add_argument('-p', '--pipeline', choices=('block', 'drop'))
+    parser.add_argument('-cy', '--cycle', choices=('detect', 'stop', 'skip'))
+    parser.add_argument('-sy', '--symmetry', choices=('C2', 'D2', 'D4'))
+    parser.add_argument('-rl', '--rule')
+    parser.add_argument('-nb', '--neighborhood', type=neighborhood)
     # requied optional int arg
-    options = (('-x',), ('-y',), ('-s', '--step'))
+    options = (('-x',), ('-y',), ('-s', '--step'), ('-wk', '--workers'),
+               ('-fd', '--fd'), ('-q', '--queue-size'), ('-hs', '--history'),
+               ('-sd', '--seed'))
     for option in options:
         parser.add_argument(*option, type=int)
     # requied optional float arg
-    options = (('-w', '--wait'), ('-d', '--delay'), ('-r', '--ratio'))
+    options = (('-w', '--wait'), ('-d', '--delay'), ('-r', '--ratio'),
+               ('-fps', '--fps'))
     for option in options:
         parser.add_argument(*option, type=float)
     # optional flag
@@ -536,7 +2278,7 @@ if __name__ == '__main__':
         ('-l', '--loop'), ('-t', '--torus'), ('-m', '--mortal'),
         ('-rand', '--random'),
         ('-c', '--color'), ('-c2', '--color2'), ('-c3', '--color3'),
-        ('-c4', '--color4'))
+        ('-c4', '--color4'), ('-hl', '--headless'), ('-g', '--gradient'))
     for option in options:
         parser.add_argument(*option, action="store_true")
     args = parser.parse_args()
@@ -546,20 +2288,41 @@ if __name__ == '__main__':
     options = (
         ('sample', args.sample), ('name', args.name), ('x', args.x),
         ('y', args.y), ('json_file', args.json), ('max_step', args.step),
-        ('delay', args.delay), ('alive', args.alive), ('ratio', args.ratio))
+        ('delay', args.delay), ('alive', args.alive), ('ratio', args.ratio),
+        ('engine', args.engine), ('workers', args.workers),
+        ('rule', args.rule), ('neighborhood', args.neighborhood),
+        ('fd', args.fd), ('fps', args.fps), ('pipeline', args.pipeline),
+        ('queue_size', args.queue_size), ('cycle', args.cycle),
+        ('history', args.history), ('symmetry', args.symmetry),
+        ('state_file', args.state_file))
     for key, value in options:
         if value:
             setting[key] = value
     # set args if not None
     if args.wait is not None:
         setting['wait'] = args.wait
+    if args.seed is not None:
+        setting['seed'] = args.seed
     # set args
     options = (
         ('loop', args.loop), ('torus', args.torus), ('mortal', args.mortal),
         ('rand', args.random),
         ('color', args.color), ('color2', args.color2),
-        ('color3', args.color3), ('color4', args.color4))
+        ('color3', args.color3), ('color4', args.color4),
+        ('gradient', args.gradient),
+        ('headless', args.headless))
     for key, value in options:
         setting[key] = value
 
-    GameOfLife(**setting).start()
+    game = GameOfLife(**setting)
+    if args.headless:
+        result = game.run()
+        print(f"step = {result['step']} ({result['gps']:.1f} gen/s)")
+        if result['period'] is not None:
+            print(f"period = {result['period']}, "
+                  f"transient = {result['transient']}")
+    else:
+        game.start()
+    # snapshot of the last generation, binary by the extension
+    if args.output:
+        game.save(args.output)
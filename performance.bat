@@ -1 +1 @@
-py -3.9 -m cProfile -s cumtime -m unittest tests.test_game_of_life.TestGameOfLife.test_noahs_ark_elp
+py -3.9 -m cProfile -s cumtime benchmark.py -s 256 -r 1
@@ -4,7 +4,16 @@ from game_of_life import GameOfLife
 
 class TestGameOfLife(unittest.TestCase):
     def test_init_default(self):
-        game = GameOfLife()
+        import os
+        import tempfile
+        # the random world is dumped in a temporary directory
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                game = GameOfLife()
+            finally:
+                os.chdir(cwd)
         self.assertIsNone(game.sample)
         self.assertEqual(game.console.name, 'game_of_life')
         self.assertEqual(game.x, 30)
@@ -199,6 +208,25 @@ class TestGameOfLife(unittest.TestCase):
             game._update()
         self.assertEqual([[x for x in row] for row in game.ages], expected)
 
+    def test_update_mortal_lut(self):
+        world = [
+            [0, 0, 0, 0],
+            [0, 1, 1, 0],
+            [0, 1, 1, 0],
+            [0, 0, 0, 0],
+        ]
+        game = GameOfLife(world=world, mortal=True)
+        self.assertEqual(game.age_lut[:10].tolist(),
+                         [1, 1, 1, 1, 1, 1, 1, 1, 1, 1])
+        self.assertEqual(game.age_lut[28:31].tolist(), [2, 2, 3])
+        self.assertEqual(game.age_lut[59:].tolist(), [0] * 197)
+        game.age_lut = game.make_age_lut([0, 2, 4])
+        expected = [1, 2, 0]
+        for i in range(3):
+            game._update()
+            self.assertEqual(game.world[1][1], expected[i])
+        self.assertEqual(game.ages.tolist(), [[0] * 4] * 4)
+
     def test_update_torus(self):
         world = [
             [0, 0, 1, 0, 0, 0, 0, 0, 0, 0],
@@ -431,51 +459,1072 @@ class TestGameOfLife(unittest.TestCase):
         self.assertEqual([[x for x in row] for row in game.ages],
                          expected_ages)
 
-    def test_glider_elp(self):
+    def test_cycle(self):
+        import numpy as np
+        from unittest import mock
+        blinker = [
+            [0, 0, 0, 0, 0],
+            [0, 0, 1, 0, 0],
+            [0, 0, 1, 0, 0],
+            [0, 0, 1, 0, 0],
+            [0, 0, 0, 0, 0],
+        ]
+        game = GameOfLife(world=blinker, headless=True, cycle='stop')
+        result = game.run(100)
+        self.assertEqual((result['period'], result['transient']), (2, 0))
+        self.assertEqual(result['step'], 3)
+
+        # colors are a part of the repeated state
+        expected = GameOfLife(world=blinker, headless=True,
+                              color=True).run(49)
+        game = GameOfLife(world=blinker, headless=True, color=True,
+                          cycle='skip')
+        result = game.run(49)
+        self.assertEqual(result['colors'].tolist(),
+                         expected['colors'].tolist())
+        self.assertEqual(result['world'].tolist(),
+                         expected['world'].tolist())
+
+        # glider on torus comes back after 4 generations per cell
+        world = np.zeros((8, 8), dtype=np.uint8)
+        world[:3, :3] = [[0, 1, 0], [0, 0, 1], [1, 1, 1]]
+        for engine in ('opencv', 'bit'):
+            game = GameOfLife(world=world, torus=True, headless=True,
+                              engine=engine, cycle='detect')
+            result = game.run(40)
+            self.assertEqual((result['period'], result['transient']),
+                             (32, 0))
+            self.assertEqual(result['step'], 41)
+
+        # transient soup settled to still lifes and oscillators
+        world = (np.random.default_rng(1).random((24, 24)) < 0.4) * 1
+        expected = GameOfLife(world=world, headless=True).run(1000)
+        game = GameOfLife(world=world, headless=True, cycle='skip')
+        with mock.patch.object(game.backend, 'step',
+                               wraps=game.backend.step) as update:
+            result = game.run(1000)
+        self.assertEqual(result['step'], 1001)
+        self.assertGreater(result['transient'], 0)
+        self.assertLess(update.call_count,
+                        result['transient'] + result['period'] * 2)
+        self.assertEqual(result['world'].tolist(),
+                         expected['world'].tolist())
+
+    def test_random_world(self):
+        import os
+        import json
+        import tempfile
+        # random worlds are made in a temporary directory for the dumps
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                self.assertRandomWorld()
+
+                # the dump has the seed to make the same world again,
+                # headless runs are not dumped
+                self.assertEqual(os.listdir(tmp), [])
+                with tempfile.TemporaryFile() as f:
+                    game = GameOfLife(symmetry='D2', x=40, y=21, ratio=0.3,
+                                      fd=f.fileno())
+                json_file, = os.listdir(tmp)
+                with open(json_file) as f:
+                    settings = json.load(f)
+                loaded = GameOfLife(json_file=json_file, headless=True)
+            finally:
+                os.chdir(cwd)
+        self.assertNotIn('world', settings)
+        self.assertEqual(settings['seed'], game.seed)
+        self.assertEqual(loaded.world.tolist(), game.world.tolist())
+
+    def assertRandomWorld(self):
+        setting = {'x': 40, 'y': 21, 'ratio': 0.3, 'headless': True}
+        game = GameOfLife(seed=7, **setting)
+        self.assertEqual(game.seed, 7)
+        self.assertEqual(game.world.tolist(),
+                         GameOfLife(seed=7, **setting).world.tolist())
+        self.assertNotEqual(game.world.tolist(),
+                            GameOfLife(seed=8, **setting).world.tolist())
+        self.assertAlmostEqual(game.world.mean(), 0.3, delta=0.05)
+
+        world = GameOfLife(seed=7, symmetry='C2', **setting).world
+        self.assertEqual(world.tolist(), world[::-1, ::-1].tolist())
+        world = GameOfLife(seed=7, symmetry='D2', **setting).world
+        self.assertEqual(world.tolist(), world[:, ::-1].tolist())
+        world = GameOfLife(seed=7, symmetry='D4', **setting).world
+        self.assertEqual(world.tolist(), world[::-1, ::-1].tolist())
+        self.assertEqual(world.tolist(), world[::-1].tolist())
+        world = GameOfLife(seed=7, gradient=True, **setting).world
+        self.assertGreater(world[:, :10].sum(), world[:, -10:].sum() * 3)
+        with self.assertRaises(ValueError):
+            GameOfLife(symmetry='C4', **setting)
+        GameOfLife(symmetry='D2', **setting)
+
+    def test_snapshot(self):
+        import os
+        import tempfile
+        setting = {'x': 50, 'y': 30, 'seed': 3, 'headless': True}
+        games = (GameOfLife(**setting),
+                 GameOfLife(mortal=True, color=True, **setting),
+                 GameOfLife(color2=True, **setting),
+                 GameOfLife(rule='345/2/4', torus=True, **setting))
+        names = ('world.json', 'world.gol', 'world.gol.gz')
+        with tempfile.TemporaryDirectory() as tmp:
+            for game in games:
+                game.run(7)
+                files = [os.path.join(tmp, name) for name in names]
+                for file in files:
+                    game.save(file)
+                loaded = [GameOfLife(json_file=file, headless=True)
+                          for file in files]
+                for other in loaded:
+                    self.assertEqual(other.world.tolist(),
+                                     game.world.tolist())
+                    self.assertEqual((other.mortal, str(other.rule)),
+                                     (game.mortal, str(game.rule)))
+
+                # binary snapshot restores the state to continue
+                game.run(5)
+                for other in loaded[1:]:
+                    self.assertEqual(other.step, 8)
+                    other.run(5)
+                    # ages and colors are kept only if they are used
+                    arrays = ['world']
+                    if game.mortal or game.rule.states > 2:
+                        arrays.append('ages')
+                    if game.color_type is not None:
+                        self.assertEqual(other.color_type, game.color_type)
+                        arrays.append('colors')
+                    for name in arrays:
+                        self.assertEqual(getattr(other, name).tolist(),
+                                         getattr(game, name).tolist())
+            # bit-packed cells and the header only
+            file = os.path.join(tmp, 'plain.gol')
+            games[0].save(file)
+            self.assertLess(os.path.getsize(file), 50 * 30 // 8 + 1024)
+
+            # the step of the caller is over the one in the snapshot
+            game = GameOfLife(json_file=file, max_step=20, headless=True)
+            self.assertEqual((game.step, game.run()['step']), (13, 20))
+
+            # foreign or truncated files are not loaded
+            with open(file, 'rb') as f:
+                data = f.read()
+            contents = (b'not a snapshot', data[:6], data[:20], data[:-1])
+            for i, content in enumerate(contents):
+                file = os.path.join(tmp, f'broken{i}.gol')
+                with open(file, 'wb') as f:
+                    f.write(content)
+                with self.assertRaises(ValueError):
+                    GameOfLife(json_file=file, headless=True)
+
+    def test_snapshot_cli(self):
+        import os
+        import subprocess
+        import sys
+        import tempfile
+        import game_of_life
+        script = game_of_life.__file__
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, 'o.gol.gz')
+            commands = (['-x', '20', '-y', '10', '-sd', '1', '-s', '30',
+                         '-hl', '-o', file],
+                        ['-j', file, '-s', '50', '-hl'],
+                        ['-j', file, '-hl'])
+            outputs = [subprocess.run(
+                [sys.executable, script, *command], cwd=tmp,
+                capture_output=True, text=True, check=True).stdout
+                for command in commands]
+        self.assertEqual([output.split(' (')[0] for output in outputs],
+                         ['step = 30', 'step = 50', 'step = 30'])
+
+    def test_load_sample(self):
+        import json
+        with open('samples.json') as f:
+            samples = json.load(f)
+        game = GameOfLife(world=[[0] * 3] * 3, headless=True)
+        for sample in samples:
+            self.assertEqual(game._load_sample('samples.json', sample),
+                             samples[sample])
+        self.assertIsNone(game._load_sample('samples.json', 'world'))
+        self.assertIsNone(game._load_sample('no_samples.json', 'glider'))
+
+    def test_lazy_import(self):
+        import subprocess
+        import sys
+        code = ('import sys; from game_of_life import GameOfLife; '
+                "GameOfLife('glider', headless=True, engine='bit').run(); "
+                "print('cv2' in sys.modules)")
+        result = subprocess.run([sys.executable, '-c', code],
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout, 'False\n')
+
+    def test_memmap(self):
+        import os
+        import subprocess
+        import sys
+        import tempfile
+        import game_of_life
+        with tempfile.TemporaryDirectory() as tmp:
+            rules = (('B3/S23', False), ('B3/S23', True),
+                     ('R2,C0,M1,S2..4,B3..4', True))
+            for i, (rule, torus) in enumerate(rules):
+                setting = {'x': 40, 'y': 23, 'seed': i, 'rule': rule,
+                           'torus': torus, 'headless': True}
+                file = os.path.join(tmp, f'state{i}.gol')
+                game = GameOfLife(**setting)
+                other = GameOfLife(engine='memmap', state_file=file,
+                                   **setting)
+                # small bands to step over the edges of them
+                other.backend.band = 3
+                self.assertEqual(other.world.tolist(), game.world.tolist())
+                game.run(6)
+                result = other.run(6)
+                self.assertEqual(other.world.tolist(), game.world.tolist())
+                # colors and ages are not allocated in the memory
+                self.assertEqual(result['colors'].strides, (0, 0))
+                self.assertIs(result['ages'], result['colors'])
+
+                # the state file continues from the generation
+                del other
+                other = GameOfLife(engine='memmap', state_file=file,
+                                   headless=True)
+                self.assertEqual((other.step, str(other.rule)),
+                                 (7, str(game.rule)))
+                game.run(4)
+                other.run(4)
+                self.assertEqual(other.world.tolist(), game.world.tolist())
+                del other
+
+            # the state file is advanced from the command line
+            file = os.path.join(tmp, 's.gol')
+            outputs = [subprocess.run(
+                [sys.executable, game_of_life.__file__, '-x', '20', '-y',
+                 '10', '-sd', '1', '-e', 'memmap', '-sf', file, '-s', step,
+                 '-hl'], cwd=tmp, capture_output=True, text=True,
+                check=True).stdout for step in ('20', '40')]
+            self.assertEqual([output.split(' (')[0] for output in outputs],
+                             ['step = 20', 'step = 40'])
+            game = GameOfLife(x=20, y=10, seed=1, headless=True)
+            game.run(39)
+            other = GameOfLife(engine='memmap', state_file=file,
+                               headless=True)
+            self.assertEqual(other.world.tolist(), game.world.tolist())
+            del other
+
+            # interrupted runs keep the header of the last generation,
+            # a step stopped halfway leaves the header dirty
+            setting = {'x': 20, 'y': 10, 'seed': 2, 'headless': True}
+            game = GameOfLife(**setting)
+            game.run(5)
+            for torn in (False, True):
+                file = os.path.join(tmp, f'interrupted{torn}.gol')
+                other = GameOfLife(engine='memmap', state_file=file,
+                                   **setting)
+                backend = other.backend
+                step, around_cells = backend.step, backend.around_cells
+
+                def interrupt_step():
+                    if backend.game.step == 6:
+                        raise KeyboardInterrupt
+                    step()
+
+                def interrupt_band(pre_cells):
+                    if backend.game.step == 6:
+                        raise KeyboardInterrupt
+                    return around_cells(pre_cells)
+
+                if torn:
+                    backend.around_cells = interrupt_band
+                else:
+                    backend.step = interrupt_step
+                with self.assertRaises(KeyboardInterrupt):
+                    other.run(10)
+                del other
+                if torn:
+                    with self.assertRaises(ValueError):
+                        GameOfLife(engine='memmap', state_file=file,
+                                   headless=True)
+                    continue
+                other = GameOfLife(engine='memmap', state_file=file,
+                                   headless=True)
+                self.assertEqual(other.step, 6)
+                self.assertEqual(other.world.tolist(), game.world.tolist())
+                del other
+
+        with self.assertRaises(ValueError):
+            GameOfLife(engine='memmap', state_file=None, headless=True)
+
+    def test_soup_search(self):
+        import numpy as np
+        from game_of_life import SoupSearch
+        worlds = np.zeros((3, 6, 6), dtype=np.uint8)
+        worlds[0, 1:3, 1:3] = 1      # block
+        worlds[1, 2, 1:4] = 1        # blinker
+        worlds[2, 0, 0:2] = 1        # dies
+        worlds[2, 4:6, 4] = 1
+        results = SoupSearch(worlds=worlds).run(100)
+        self.assertEqual([r['period'] for r in results], [1, 2, 1])
+        self.assertEqual([r['transient'] for r in results], [0, 0, 1])
+        self.assertEqual([r['step'] for r in results], [1, 2, 2])
+        self.assertEqual(results[1]['population'], [3, 3, 3])
+        self.assertEqual(results[2]['population'], [4, 0, 0])
+        self.assertEqual(results[0]['census'], {'oo$oo': 1})
+        self.assertEqual(results[1]['census'], {'o$o$o': 1})
+        self.assertEqual(results[2]['census'], {})
+
+        # same as the worlds stepped one by one
+        worlds = (np.random.default_rng(2).random((8, 15, 30)) < 0.5) * 1
+        soup = SoupSearch(worlds=worlds, torus=True, rule='B36/S23')
+        results = soup.run(200)
+        for world, result in zip(worlds, results):
+            game = GameOfLife(world=world, torus=True, rule='B36/S23',
+                              headless=True, cycle='stop')
+            expected = game.run(200)
+            self.assertEqual(result['period'], expected['period'])
+            self.assertEqual(result['transient'], expected['transient'])
+        self.assertEqual(soup.worlds[-1].tolist(), game.world.tolist())
+
+    def test_console_fd(self):
+        import os
+        from unittest import mock
+        world = [
+            [0, 1, 0],
+            [0, 1, 0],
+            [0, 1, 0],
+        ]
+        read_fd, write_fd = os.pipe()
+        game = GameOfLife(world=world, fd=write_fd)
+        self.assertEqual(game.console.fd, write_fd)
+        with mock.patch('os.write', wraps=os.write) as write:
+            game.console.display(game.world, game.step, game.colors)
+            game._update()
+            game.console.update(game.diff_world, game.step, game.colors,
+                                game.world)
+            # one write per frame
+            self.assertEqual(write.call_count, 2)
+        os.close(write_fd)
+        with os.fdopen(read_fd, encoding=game.console.encoding) as f:
+            frames = f.read()
+        self.assertEqual(frames, (
+            'game_of_life (3 x 3)\n'
+            '┌───────┐\n'
+            '│ 　■　│\n'
+            '│ 　■　│\n'
+            '│ 　■　│\n'
+            '└───────┘\n'
+            '\033[39mstep = 1\n'
+            '\033[5F\033[4C　'
+            '\033[1E\033[2C■\033[2C■'
+            '\033[1E\033[4C　'
+            '\033[2E'
+            '\033[39mstep = 2\n'))
+
+    def test_console_world_color(self):
+        world = [
+            [1, 1, 0, 1],
+            [0, 0, 1, 0],
+        ]
+        colors = [
+            [2, 2, 0, 3],
+            [0, 0, 1, 0],
+        ]
+        game = GameOfLife(world=world, color=True)
+        console = game.console
+        console._write_world(game.world, colors)
+        green, red = console.color_list[2], console.color_list[3]
+        white, default = console.color_list[1], console.color_list[0]
+        self.assertEqual(console.buffer.getvalue(), (
+            '┌─────────┐\n'
+            f'│ {green}■■　{red}■{default}│\n'
+            f'│ 　　{white}■　{default}│\n'
+            '└─────────┘\n'))
+
+    def test_console_diff(self):
+        import io
+        world = [
+            [0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0],
+            [1, 1, 1, 0, 0],
+            [0, 0, 0, 0, 0],
+        ]
+        colors = [
+            [0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0],
+            [2, 2, 3, 0, 0],
+            [0, 0, 0, 0, 0],
+        ]
+        diff_world = [
+            [0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0],
+            [2, 2, 2, 0, 0],
+            [0, 1, 0, 0, 0],
+        ]
+        game = GameOfLife(world=world, color=True)
+        console = game.console
+        green, red = console.color_list[2], console.color_list[3]
+        # same color runs share the code and dead cells need no color
+        console._write_diff(diff_world, colors, world, console.color_list)
+        self.assertEqual(console.buffer.getvalue(), (
+            f'\033[4F\033[2C{green}■■{red}■'
+            '\033[1E\033[4C　'
+            '\033[2E'))
+
+        # redraw all when most of cells are changed
+        console.buffer = io.StringIO()
+        console.redraw_ratio = 0.1
+        console._write_diff(diff_world, colors, world, console.color_list)
+        expected = io.StringIO()
+        console.buffer, screen = expected, console.buffer
+        console._write_world(world, colors)
+        self.assertEqual(screen.getvalue(),
+                         '\033[7F' + expected.getvalue())
+
+    def test_wait_fps(self):
         import time
-        start = time.perf_counter()
+        game = GameOfLife(sample='glider', fps=100)
+        game._frame = game._rendered = time.perf_counter()
+        self.assertTrue(game._wait())
+        self.assertGreaterEqual(time.perf_counter(), game._frame)
 
-        setting = {}
-        setting['sample'] = 'glider'
-        setting['wait'] = 0.0
-        GameOfLife(**setting).start()
+        # drop the generation behind the schedule
+        game._frame -= 1
+        game._rendered = time.perf_counter()
+        self.assertFalse(game._wait())
+        self.assertEqual(game.dropped, 1)
+        self.assertEqual(game.console._get_step(3), '\033[39mstep = 3\n')
+        game.console.dropped = game.dropped
+        self.assertEqual(game.console._get_step(3),
+                         '\033[39mstep = 3 (dropped = 1)\n')
 
-        end = time.perf_counter()
-        elp = end - start
-        print(f'\n[elp : {elp:.3f}(s)]')
-        self.assertLessEqual(elp, 0.4 * 1.1)
+        # render the last generation anyway
+        game._frame -= 1
+        game.step = game.max_step
+        self.assertTrue(game._wait())
 
-    def test_tree_elp(self):
+    def test_start_fps(self):
+        import os
         import time
-        start = time.perf_counter()
+        from unittest import mock
+        read_fd, write_fd = os.pipe()
+        game = GameOfLife(sample='glider', fps=100, fd=write_fd)
+        update = game.console.update
+        frames = []
 
-        setting = {}
-        setting['sample'] = 'tree'
-        setting['torus'] = True
-        setting['mortal'] = True
-        setting['color'] = True
-        setting['wait'] = 0.0
-        GameOfLife(**setting).start()
+        def slow_update(diff_world, step, colors, world):
+            frames.append(step)
+            update(diff_world, step, colors, world)
+            time.sleep(0.02)
 
-        end = time.perf_counter()
-        elp = end - start
-        print(f'\n[elp : {elp:.3f}(s)]')
-        self.assertLessEqual(elp, 1.0 * 1.1)
+        with mock.patch.object(game.console, 'update', slow_update):
+            game.start()
+        os.close(write_fd)
+        os.close(read_fd)
+        self.assertGreater(game.dropped, 0)
+        self.assertEqual(len(frames) + game.dropped, game.max_step - 1)
+        self.assertEqual(frames[-1], game.max_step)
 
-    def test_noahs_ark_elp(self):
+    def test_start_pipeline(self):
+        import os
         import time
-        start = time.perf_counter()
+        from unittest import mock
+        for pipeline in ('block', 'drop'):
+            read_fd, write_fd = os.pipe()
+            game = GameOfLife(sample='glider', wait=0, fd=write_fd,
+                              pipeline=pipeline, queue_size=2)
+            update = game.console.update
+            frames = []
+
+            def slow_update(diff_world, step, colors, world):
+                frames.append(step)
+                update(diff_world, step, colors, world)
+                time.sleep(0.01)
+
+            with mock.patch.object(game.console, 'update', slow_update):
+                game.start()
+            os.close(write_fd)
+            os.close(read_fd)
+            self.assertEqual(frames[-1], game.max_step)
+            if pipeline == 'block':
+                self.assertEqual(game.dropped, 0)
+                self.assertEqual(frames, list(range(2, game.max_step + 1)))
+            else:
+                self.assertGreater(game.dropped, 0)
+                self.assertEqual(len(frames) + game.dropped,
+                                 game.max_step - 1)
+
+        with self.assertRaises(ValueError):
+            GameOfLife(sample='glider', pipeline='unknown')
+
+    def test_renderer_error(self):
+        import numpy as np
+        from unittest import mock
+        from game_of_life import Renderer
+        world = np.zeros((3, 3), dtype=np.uint8)
+        console = mock.Mock()
+        console.update.side_effect = OSError('closed')
+        renderer = Renderer(console, world, 'block', 1)
+        with self.assertRaises(OSError):
+            for step in range(5):
+                renderer.push(world, step, world)
+            renderer.close()
+
+        # console is torn down even when the renderer raises
+        import tempfile
+        with tempfile.TemporaryFile() as f:
+            game = GameOfLife('glider', wait=0.0, pipeline='block',
+                              fd=f.fileno())
+            game.console.update = mock.Mock(side_effect=OSError('closed'))
+            game.console.teardown = mock.Mock()
+            with self.assertRaises(OSError):
+                game.start()
+            game.console.teardown.assert_called_once()
+
+            # endless loops stop at the push after the renderer died
+            import threading
+            for pipeline in ('block', 'drop'):
+                game = GameOfLife('glider', wait=0.0, pipeline=pipeline,
+                                  loop=True, fd=f.fileno())
+                game.console.update = mock.Mock(
+                    side_effect=OSError('closed'))
+                errors = []
+
+                def start():
+                    try:
+                        game.start()
+                    except OSError as e:
+                        errors.append(e)
+
+                thread = threading.Thread(target=start, daemon=True)
+                thread.start()
+                thread.join(10)
+                self.assertFalse(thread.is_alive())
+                self.assertEqual(len(errors), 1)
 
-        setting = {}
-        setting['sample'] = 'noahs-ark'
-        setting['torus'] = True
-        setting['mortal'] = True
-        setting['color2'] = True
+    def test_run_headless(self):
+        world = [
+            [0, 0, 1, 0, 0, 0],
+            [1, 0, 1, 0, 0, 0],
+            [0, 1, 1, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+        ]
+        expected = [
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 1, 0, 0],
+            [0, 1, 0, 1, 0, 0],
+            [0, 0, 1, 1, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+        ]
+        game = GameOfLife(world=world, max_step=5, headless=True)
+        self.assertIsNone(game.console)
+        result = game.run()
+        self.assertEqual(result['step'], 5)
+        self.assertEqual([[x for x in row] for row in result['world']],
+                         expected)
+        self.assertGreater(result['gps'], 0)
+        result = game.run(4)
+        self.assertEqual(result['step'], 9)
+
+        # results are not overwritten by the next steps
+        game = GameOfLife(world=world, headless=True, mortal=True,
+                          color=True)
+        result = game.run(5)
+        arrays = {name: result[name].tolist()
+                  for name in ('world', 'colors', 'ages')}
+        game.run(2)
+        for name, array in arrays.items():
+            self.assertEqual(result[name].tolist(), array)
+
+    def test_update_bit(self):
+        import numpy as np
+        world = (np.random.default_rng(0).random((33, 70)) < 0.4) * 1
+        for torus in (False, True):
+            game = GameOfLife(world=world, torus=torus, headless=True)
+            game_bit = GameOfLife(world=world, torus=torus, headless=True,
+                                  engine='bit')
+            for _ in range(30):
+                game._update()
+                game_bit._update()
+                self.assertEqual(game_bit.world.tolist(), game.world.tolist())
+                self.assertEqual(game_bit.diff_world.tolist(),
+                                 game.diff_world.tolist())
+            game_bit = GameOfLife(world=world, torus=torus, headless=True,
+                                  engine='bit')
+            game_bit.run(30)
+            self.assertEqual(game_bit.world.tolist(), game.world.tolist())
+
+        # colors and ages are not allocated, the world is unpacked when
+        # it is read
+        self.assertEqual(game_bit.colors.strides, (0, 0))
+        self.assertIs(game_bit.ages, game_bit.colors)
+        game_bit.backend.step()
+        self.assertIsNone(game_bit._world)
+        self.assertEqual(game_bit.colors.shape, game_bit.world.shape)
+        self.assertIsNotNone(game_bit._world)
+
+    def test_update_bit_invalid(self):
+        world = [[0, 1], [1, 0]]
+        with self.assertRaises(ValueError):
+            GameOfLife(world=world, mortal=True, engine='bit')
+        with self.assertRaises(ValueError):
+            GameOfLife(world=world, color=True, engine='bit')
+        # packed cells do not count the middle cell
+        for engine in ('bit', 'hashlife'):
+            with self.assertRaises(ValueError):
+                GameOfLife(world=world, rule='R1,C0,M1,S3..4,B3,NM',
+                           headless=True, engine=engine)
+            game = GameOfLife(world=world, rule='R1,C0,M0,S2..3,B3,NM',
+                              headless=True, engine=engine)
+            self.assertEqual(game.engine, engine)
+
+    def test_update_hashlife(self):
+        import numpy as np
+        world = np.zeros((40, 50), dtype=np.uint8)
+        world[10:30, 15:35] = np.random.default_rng(1).random((20, 20)) < 0.4
+        game = GameOfLife(world=world, headless=True)
+        game_hash = GameOfLife(world=world, headless=True, engine='hashlife')
+        for _ in range(8):
+            game._update()
+            game_hash._update()
+            self.assertEqual(game_hash.world.tolist(), game.world.tolist())
+        game_hash = GameOfLife(world=world, headless=True, engine='hashlife')
+        game_hash.run(8)
+        self.assertEqual(game_hash.world.tolist(), game.world.tolist())
+        self.assertEqual(game_hash.backend.hashlife.world_at(0).tolist(),
+                         world.tolist())
+
+    def test_hashlife_jump(self):
+        from game_of_life import HashLife
+        glider = [
+            [0, 0, 1, 0],
+            [1, 0, 1, 0],
+            [0, 1, 1, 0],
+            [0, 0, 0, 0],
+        ]
+        hashlife = HashLife(glider, cache_size=5000)
+        hashlife.advance(4 * 10**9 + 4)
+        self.assertEqual(hashlife.generation, 4 * 10**9 + 4)
+        self.assertEqual(hashlife.population, 5)
+        self.assertLessEqual(len(hashlife._nodes), 5000)
+        self.assertLessEqual(len(hashlife._results), 5000)
+        self.assertEqual(hashlife.world_at(4).tolist(), [
+            [0, 0, 0, 0],
+            [0, 0, 0, 1],
+            [0, 1, 0, 1],
+            [0, 0, 1, 1],
+        ])
+
+    def test_update_sparse(self):
+        import numpy as np
+        world = np.zeros((70, 100), dtype=np.uint8)
+        world[20:40, 30:60] = np.random.default_rng(2).random((20, 30)) < 0.4
+        for torus, mortal, color in ((False, False, False),
+                                     (True, True, True)):
+            setting = {'world': world, 'torus': torus, 'mortal': mortal,
+                       'color': color, 'headless': True}
+            game = GameOfLife(**setting)
+            game_sparse = GameOfLife(**setting, engine='sparse')
+            for _ in range(50):
+                game._update()
+                game_sparse._update()
+                for name in ('world', 'colors', 'ages', 'diff_world'):
+                    self.assertEqual(getattr(game_sparse, name).tolist(),
+                                     getattr(game, name).tolist())
+
+    def test_update_sparse_active(self):
+        import numpy as np
+        world = np.zeros((128, 128), dtype=np.uint8)
+        world[1:4, 1:4] = [[0, 1, 0], [0, 0, 1], [1, 1, 1]]
+        world[100:102, 100:102] = 1
+        game = GameOfLife(world=world, headless=True, engine='sparse')
+        game._update()
+        self.assertEqual(game.backend.active.sum(), 4)
+        self.assertFalse(game.backend.active[3, 3])
+        game.run(7)
+        self.assertEqual(game.world[3:6, 3:6].tolist(),
+                         [[0, 1, 0], [0, 0, 1], [1, 1, 1]])
+
+    def test_update_parallel(self):
+        import numpy as np
+        world = np.random.default_rng(3).random((70, 40)) < 0.4
+        for torus, mortal, color in ((False, False, False),
+                                     (True, True, True)):
+            setting = {'world': world * 1, 'torus': torus, 'mortal': mortal,
+                       'color': color, 'headless': True}
+            game = GameOfLife(**setting)
+            game_parallel = GameOfLife(**setting, engine='parallel',
+                                       workers=3)
+            self.assertEqual(len(game_parallel.backend.bands), 3)
+            for _ in range(30):
+                game._update()
+                game_parallel._update()
+                for name in ('world', 'colors', 'ages', 'diff_world'):
+                    self.assertEqual(getattr(game_parallel, name).tolist(),
+                                     getattr(game, name).tolist())
+
+    def test_update_buffers(self):
+        world = [
+            [0, 0, 0, 0, 0],
+            [0, 0, 1, 0, 0],
+            [0, 0, 1, 0, 0],
+            [0, 0, 1, 0, 0],
+            [0, 0, 0, 0, 0],
+        ]
+        game = GameOfLife(world=world, torus=True, mortal=True, color=True)
+        buffers = [game.world, game.colors, game.ages, game.diff_world]
+        game._update()
+        self.assertIsNot(game.world, buffers[0])
+        game._update()
+        self.assertIs(game.world, buffers[0])
+        self.assertIs(game.colors, buffers[1])
+        self.assertIs(game.ages, buffers[2])
+        self.assertIs(game.diff_world, buffers[3])
+        self.assertEqual([[x for x in row] for row in game.world], world)
+
+    def test_rule(self):
+        from game_of_life import Rule
+        rule = Rule('B36/S23')
+        self.assertEqual(rule.born, {3, 6})
+        self.assertEqual(rule.survive, {2, 3})
+        self.assertEqual(str(Rule('s34678/b3678')), 'B3678/S34678')
+        self.assertEqual(str(Rule('23/3')), 'B3/S23')
+        self.assertEqual(str(Rule('B2/S')), 'B2/S')
+        self.assertEqual(rule.table.tolist(), [
+            [0, 0, 0, 1, 0, 0, 1, 0, 0],
+            [0, 0, 1, 1, 0, 0, 0, 0, 0],
+        ])
+        for invalid in ('B3', 'B3/S2/3', 'B39/S23', 'B3/B23', 'Bx/S23'):
+            with self.assertRaises(ValueError):
+                Rule(invalid)
+
+    def test_update_rule(self):
+        import numpy as np
+        game = GameOfLife(sample='replicator', headless=True)
+        self.assertEqual(str(game.rule), 'B36/S23')
+        game.run(12)
+        # replicator makes two copies of itself
+        self.assertEqual(game.world.sum(), 24)
+        game = GameOfLife(sample='replicator', headless=True, rule='B3/S23')
+        game.run(12)
+        self.assertNotEqual(game.world.sum(), 24)
+
+        world = (np.random.default_rng(4).random((30, 70)) < 0.5) * 1
+        for rule in ('B36/S23', 'B3678/S34678', 'B2/S'):
+            game = GameOfLife(world=world, torus=True, headless=True,
+                              rule=rule)
+            game_bit = GameOfLife(world=world, torus=True, headless=True,
+                                  rule=rule, engine='bit')
+            game.run(20)
+            game_bit.run(20)
+            self.assertEqual(game_bit.world.tolist(), game.world.tolist())
+
+    def test_update_generations(self):
+        from game_of_life import Rule
+        self.assertEqual(str(Rule('/2/3')), 'B2/S/C3')
+        self.assertEqual(str(Rule('345/2/4')), 'B2/S345/C4')
+        self.assertEqual(Rule('B2/S/C3').table.tolist(), [
+            [0, 0, 1, 0, 0, 0, 0, 0, 0],
+            [2, 2, 2, 2, 2, 2, 2, 2, 2],
+            [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        ])
+        with self.assertRaises(ValueError):
+            Rule('B2/S/C1')
+
+        world = [
+            [0, 0, 0, 0],
+            [0, 1, 1, 0],
+            [0, 0, 0, 0],
+            [0, 0, 0, 0],
+        ]
+        expected = [
+            [0, 1, 1, 0],
+            [0, 2, 2, 0],
+            [0, 1, 1, 0],
+            [0, 0, 0, 0],
+        ]
+        game = GameOfLife(world=world, rule='/2/3')
+        game._update()
+        self.assertEqual(game.ages.tolist(), expected)
+        self.assertEqual(game.world.tolist(), expected)
+        with self.assertRaises(ValueError):
+            GameOfLife(world=world, rule='/2/3', mortal=True)
+
+        # dying states are shown with the later marks
+        game = GameOfLife(world=world, rule='B2/S/C8')
+        self.assertEqual(game.age_lut[:9].tolist(),
+                         [0, 1, 2, 2, 2, 3, 3, 3, 0])
+
+    def test_update_generations_engines(self):
+        import numpy as np
+        world = (np.random.default_rng(5).random((40, 70)) < 0.3) * 1
+        setting = {'world': world, 'torus': True, 'color': True,
+                   'rule': '345/2/4', 'headless': True}
+        game = GameOfLife(**setting)
+        game_sparse = GameOfLife(**setting, engine='sparse')
+        game_parallel = GameOfLife(**setting, engine='parallel', workers=2)
+        for _ in range(20):
+            for g in (game, game_sparse, game_parallel):
+                g._update()
+            for name in ('world', 'colors', 'ages', 'diff_world'):
+                expected = getattr(game, name).tolist()
+                self.assertEqual(getattr(game_sparse, name).tolist(),
+                                 expected)
+                self.assertEqual(getattr(game_parallel, name).tolist(),
+                                 expected)
+
+    def test_rule_ltl(self):
+        from game_of_life import Rule
+        rule = Rule('R5,C0,M1,S34..58,B34..45,NM')
+        self.assertEqual(str(rule), 'R5,C0,M1,S34..58,B34..45,NM')
+        self.assertEqual((rule.neighborhood, rule.middle), ('moore5', 1))
+        self.assertEqual(str(Rule('R2,C3,S2..3,B3..3,NN')),
+                         'R2,C3,M0,S2..3,B3,NN')
+
+        game = GameOfLife(world=[[0] * 5] * 5, neighborhood='neumann')
+        self.assertEqual(game.kernel.tolist(), [
+            [0, 1, 0],
+            [1, 0, 1],
+            [0, 1, 0],
+        ])
+        game = GameOfLife(world=[[0] * 5] * 5, neighborhood='circular2')
+        self.assertEqual(game.kernel.tolist(), [
+            [0, 1, 1, 1, 0],
+            [1, 1, 1, 1, 1],
+            [1, 1, 0, 1, 1],
+            [1, 1, 1, 1, 1],
+            [0, 1, 1, 1, 0],
+        ])
+        # the radius is 1 or more
+        for neighborhood in ('moore0', [[1]], [[0, 1], [1, 0]]):
+            with self.assertRaises(ValueError):
+                GameOfLife(world=[[0] * 5] * 5, neighborhood=neighborhood)
+
+    def test_update_ltl_engines(self):
+        import numpy as np
+        world = (np.random.default_rng(7).random((48, 64)) < 0.4) * 1
+        for rule in ('R2,C0,M1,S4..7,B5..6,NM', 'R3,C4,M0,S5..12,B7..9,NC'):
+            for torus in (False, True):
+                setting = {'world': world, 'torus': torus, 'color': True,
+                           'rule': rule, 'headless': True}
+                game = GameOfLife(**setting)
+                game_fft = GameOfLife(**setting)
+                game_fft.backend.fft = True
+                game_sparse = GameOfLife(**setting, engine='sparse')
+                game_parallel = GameOfLife(**setting, engine='parallel',
+                                           workers=2)
+                game_numpy = GameOfLife(**setting, engine='numpy')
+                games = (game_fft, game_sparse, game_parallel, game_numpy)
+                for _ in range(10):
+                    game._update()
+                    for g in games:
+                        g._update()
+                    for g in games:
+                        self.assertEqual(g.world.tolist(),
+                                         game.world.tolist())
+
+    def test_update_numpy(self):
+        import numpy as np
+        world = (np.random.default_rng(5).random((37, 53)) < 0.4) * 1
+        weights = [[0, 1, 2, 1, 0], [1, 0, 2, 0, 1], [2, 2, 0, 2, 2],
+                   [1, 0, 2, 0, 1], [0, 1, 2, 1, 0]]
+        settings = ({'mortal': True, 'color': True},
+                    {'torus': True, 'color': True},
+                    {'torus': True, 'rule': '345/2/4'},
+                    {'rule': 'B2/S', 'neighborhood': 'neumann2'},
+                    {'torus': True, 'rule': 'B6/S45', 'neighborhood': weights},
+                    {'color': True,
+                     'rule': 'R4,C0,M1,S6..14,B9..12,NC'})
+        for setting in settings:
+            setting.update({'world': world, 'headless': True})
+            game = GameOfLife(**setting)
+            other = GameOfLife(engine='numpy', **setting)
+            for _ in range(8):
+                game._update()
+                other._update()
+                for name in ('world', 'colors', 'ages', 'diff_world'):
+                    self.assertEqual(getattr(other, name).tolist(),
+                                     getattr(game, name).tolist())
+
+    def test_step_n(self):
+        import numpy as np
+        world = (np.random.default_rng(9).random((29, 41)) < 0.4) * 1
+        settings = ({}, {'torus': True}, {'mortal': True, 'color': True},
+                    {'rule': 'R2,C0,M1,S3..5,B3..4,NN', 'torus': True},
+                    {'rule': '345/2/4'})
+        for setting in settings:
+            for engine in ('opencv', 'numpy'):
+                setting.update({'world': world, 'headless': True,
+                                'engine': engine})
+                game = GameOfLife(**setting)
+                other = GameOfLife(**setting)
+                for _ in range(11):
+                    game._update()
+                other.step_n(11)
+                for name in ('world', 'diff_world', 'step'):
+                    self.assertEqual(np.asarray(getattr(other, name)).tolist(),
+                                     np.asarray(getattr(game, name)).tolist())
+
+        # bands and generations over the edges of them
+        for torus in (False, True):
+            game = GameOfLife(world=world, torus=torus, headless=True)
+            other = GameOfLife(world=world, torus=torus, headless=True)
+            for _ in range(10):
+                game._update()
+            other.backend._step_blocked(10, depth=3, band=4)
+            self.assertEqual(other.world.tolist(), game.world.tolist())
+            self.assertEqual(other.step, game.step)
+
+        # packed engines diff the last generation too, the cells are far
+        # from the edges for hashlife
+        inner = np.zeros((29, 41), dtype=np.uint8)
+        inner[10:19, 12:29] = world[10:19, 12:29]
+        for engine in ('bit', 'hashlife'):
+            game = GameOfLife(world=inner, headless=True)
+            other = GameOfLife(world=inner, headless=True, engine=engine)
+            for _ in range(6):
+                game._update()
+            other.run(6)
+            for name in ('world', 'diff_world', 'step'):
+                self.assertEqual(np.asarray(getattr(other, name)).tolist(),
+                                 np.asarray(getattr(game, name)).tolist())
+
+    def test_engine(self):
+        import numpy as np
+        from game_of_life import Engine, NumpyEngine
+        # cells are far from the edges, which hashlife does not have
+        world = np.zeros((32, 32), dtype=np.uint8)
+        world[10:22, 10:22] = np.random.default_rng(3).random((12, 12)) < 0.4
+        game = GameOfLife(world=world, headless=True)
+        state = game.backend.get_state()
+        game.run(5)
+        for engine in ('opencv', 'numpy', 'bit', 'hashlife', 'sparse',
+                       'parallel'):
+            other = GameOfLife(world=np.zeros((32, 32)), headless=True,
+                               engine=engine)
+            other.backend.set_state(state)
+            other.run(5)
+            self.assertEqual(other.backend.get_state()['world'].tolist(),
+                             game.world.tolist())
+            self.assertEqual(other.step, 6)
+            other.backend.close()
+
+        # engines are pluggable by a subclass
+        class StillEngine(Engine):
+            name = 'still'
+
+            def step(self):
+                self.game.step += 1
+
+        other = GameOfLife(world=world, headless=True, engine=StillEngine)
+        other.run(3)
+        self.assertEqual((other.engine, other.step), ('still', 4))
+        self.assertEqual(other.world.tolist(), world.tolist())
+
+        # the sums of the dense engine are a method of it
+        class SlicesEngine(NumpyEngine):
+            name = 'slices'
+            calls = 0
+
+            def around_cells(self, pre_cells, dst=None):
+                SlicesEngine.calls += 1
+                return super().around_cells(pre_cells, dst)
+
+        other = GameOfLife(world=world, headless=True, engine=SlicesEngine)
+        other.run(5)
+        self.assertEqual(other.world.tolist(), game.world.tolist())
+        self.assertEqual(SlicesEngine.calls, 5)
+
+    def test_select_engine(self):
+        import json
+        import os
+        import tempfile
+        setting = {'sample': 'glider', 'headless': True, 'engine': 'auto'}
+        engine_cache = GameOfLife.engine_cache
+        with tempfile.TemporaryDirectory() as tmp:
+            GameOfLife.engine_cache = os.path.join(tmp, 'cache',
+                                                   'engines.json')
+            try:
+                game = GameOfLife(**setting)
+                with open(GameOfLife.engine_cache) as f:
+                    cache = json.load(f)
+                (result,) = cache.values()
+                self.assertEqual(game.engine, result['engine'])
+                self.assertEqual(min(result['times'],
+                                     key=result['times'].get),
+                                 game.engine)
+                self.assertNotIn('memmap', result['times'])
+                # hashlife runs on the unbounded plane
+                self.assertNotIn('hashlife', result['times'])
+                other = GameOfLife(sample='glider', headless=True)
+                self.assertEqual(game.run()['world'].tolist(),
+                                 other.run()['world'].tolist())
+
+                # measured once, then read from the cache
+                result['engine'] = 'numpy'
+                with open(GameOfLife.engine_cache, 'w') as f:
+                    json.dump(cache, f)
+                self.assertEqual(GameOfLife(**setting).engine, 'numpy')
+                # engines out of the candidates are measured again
+                result['engine'] = 'hashlife'
+                with open(GameOfLife.engine_cache, 'w') as f:
+                    json.dump(cache, f)
+                self.assertNotEqual(GameOfLife(**setting).engine, 'hashlife')
+                # the cache is replaced, no file is left aside
+                self.assertEqual(os.listdir(os.path.join(tmp, 'cache')),
+                                 ['engines.json'])
+                game = GameOfLife(color=True, **setting)
+                self.assertNotIn(game.engine, ('bit', 'hashlife'))
+            finally:
+                GameOfLife.engine_cache = engine_cache
+
+    def assertStartLikeRun(self, setting):
+        # rendered generations end in the same state as headless ones,
+        # speed is measured by benchmark.py
+        import tempfile
         setting['wait'] = 0.0
-        for _ in range(3):
-            GameOfLife(**setting).start()
+        with tempfile.TemporaryFile() as f:
+            game = GameOfLife(fd=f.fileno(), **setting)
+            game.start()
+            self.assertGreater(f.tell(), 0)
+        other = GameOfLife(headless=True, **setting)
+        other.run()
+        self.assertEqual(game.step, game.max_step)
+        self.assertEqual(game.world.tolist(), other.world.tolist())
+        self.assertEqual(game.step, other.step)
+        if game.mortal or game.color_type is not None:
+            self.assertEqual(game.colors.tolist(), other.colors.tolist())
+            self.assertEqual(game.ages.tolist(), other.ages.tolist())
+
+    def test_glider_start(self):
+        self.assertStartLikeRun({'sample': 'glider'})
+
+    def test_tree_start(self):
+        self.assertStartLikeRun({'sample': 'tree', 'torus': True,
+                                 'mortal': True, 'color': True})
+
+    def test_noahs_ark_start(self):
+        self.assertStartLikeRun({'sample': 'noahs-ark', 'torus': True,
+                                 'mortal': True, 'color2': True})
+
+    def test_benchmark(self):
+        import benchmark
+        report = benchmark.run(sizes=(16,), engines=('opencv', 'bit'),
+                               steps=2, warmup=1, repeat=2, cells=0)
+        results = report['results']
+        # bit engine is not for mortal or color runs
+        self.assertEqual(len(results), 20 + 2 + 20)
+        for result in results:
+            self.assertGreater(result['median'], 0)
+            self.assertEqual(result['repeat'], 2)
+            self.assertEqual(result['unit'], 'cells/s'
+                             if result['kind'] == 'engine' else 'bytes/s')
 
-        end = time.perf_counter()
-        elp = end - start
-        print(f'\n[elp : {elp:.3f}(s)]')
-        self.assertLessEqual(elp, 15.0 * 1.1)
+        # slower results than the base are regressions
+        base = {'results': [dict(result, median=result['median'] * 2)
+                            for result in results[:3]]}
+        regressions = benchmark.compare(report, base, 0.1)
+        self.assertEqual(regressions, results[:3])
+        self.assertAlmostEqual(results[0]['ratio'], 0.5)